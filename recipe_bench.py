@@ -0,0 +1,341 @@
+"""Synthetic catalogues and a benchmark harness for the recipe store.
+
+    python recipe_bench.py generate 100000 big.json --names sorted
+    python recipe_bench.py run --sizes 1000,10000 --out results.json
+    python recipe_bench.py run --sizes 1000,10000 --baseline results.json
+
+Every catalogue is generated from a seed, so two runs at the same size
+time exactly the same data. Each operation is sampled many times, and its
+latency percentiles (in milliseconds) are written as JSON with the peak
+traced memory of loading and indexing. Comparing against a baseline file
+exits with status 1 when any p50 got slower by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from recipe_storage import JournalStorage, SQLiteStorage
+from recipe_store import RecipeStore
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+NAME_DISTRIBUTIONS = ('random', 'sorted', 'zipf')
+
+_ONSETS = ('b', 'ch', 'd', 'f', 'g', 'k', 'l', 'm', 'n', 'p', 'r', 's', 'sh', 't', 'v', 'z')
+_VOWELS = ('a', 'e', 'i', 'o', 'u', 'ai', 'ou')
+_STYLES = ('Roast', 'Stew', 'Soup', 'Salad', 'Curry', 'Pie', 'Tart', 'Bake', 'Fry', 'Noodles', 'Rice', 'Bread')
+_UNITS = ('cup', 'cups', 'tbsp', 'tsp', 'g', 'kg', 'ml', 'pinch of', 'cloves', 'slices')
+_STEPS = ('Chop the {0}.', 'Heat the {0} gently.', 'Mix the {0} well.', 'Season the {0} to taste.',
+          'Simmer the {0} for {1} minutes.', 'Bake at {1}0 degrees until golden.', 'Serve warm.')
+
+
+def _word(rng, syllables):
+    return ''.join(rng.choice(_ONSETS) + rng.choice(_VOWELS) for _ in range(syllables))
+
+
+def make_vocabulary(size, seed=0):
+    """A deterministic list of size distinct made-up ingredient words"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add(_word(rng, rng.randint(2, 3)))
+    return sorted(words)
+
+
+def generate_recipes(count, seed=0, names='random', vocabulary=500, ingredients=(3, 12), steps=(2, 8)):
+    """Yield count synthetic recipes (without IDs), the same ones for the same arguments.
+
+    names picks the name distribution: 'random' draws every word uniformly,
+    'zipf' skews the leading word so a few prefixes are very common (like
+    real "Chicken ..." catalogues), and 'sorted' yields the random names in
+    name order, the worst case for an unbalanced tree. vocabulary is the
+    number of distinct ingredient words.
+    """
+    if names not in NAME_DISTRIBUTIONS:
+        raise ValueError(f"Unknown name distribution {names!r}")
+    rng = random.Random(seed)
+    vocab = make_vocabulary(vocabulary, seed)
+    leading = make_vocabulary(max(50, vocabulary // 4), seed + 1)
+    weights = [1 / rank for rank in range(1, len(leading) + 1)] if names == 'zipf' else None
+
+    def name_at():
+        first = rng.choices(leading, weights)[0] if weights else rng.choice(leading)
+        return f"{first.title()} {rng.choice(vocab).title()} {rng.choice(_STYLES)}"
+
+    def recipe_for(name):
+        chosen = rng.sample(vocab, rng.randint(*ingredients))
+        return {
+            'name': name,
+            'ingredients': [f"{rng.randint(1, 5)} {rng.choice(_UNITS)} {word}" for word in chosen],
+            'instructions': [
+                rng.choice(_STEPS).format(rng.choice(chosen), rng.randint(2, 9))
+                for _ in range(rng.randint(*steps))
+            ]
+        }
+
+    # Names repeat once the word space runs out, so collisions get a number
+    seen = {}
+    all_names = []
+    for _ in range(count):
+        name = name_at()
+        key = name.casefold()
+        if key in seen:
+            seen[key] += 1
+            name = f"{name} {seen[key]}"
+            key = name.casefold()
+        seen.setdefault(key, 1)
+        all_names.append(name)
+    if names == 'sorted':
+        all_names.sort(key=str.casefold)
+    for name in all_names:
+        yield recipe_for(name)
+
+
+def write_catalogue(path, recipes):
+    """Write recipes as a JSON array catalogue with IDs; returns the count"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for count, recipe in enumerate(recipes, 1):
+            f.write(',\n' if count > 1 else '\n')
+            json.dump({'id': count, **recipe}, f)
+        f.write('\n]\n')
+    return count
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def at(fraction):
+        return round(ordered[min(n - 1, int(fraction * n))] * 1000, 4)
+
+    return {
+        'count': n,
+        'mean': round(sum(ordered) / n * 1000, 4),
+        'p50': at(0.50),
+        'p90': at(0.90),
+        'p99': at(0.99),
+        'max': round(ordered[-1] * 1000, 4),
+    }
+
+
+def timed(samples, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    samples.append(time.perf_counter() - started)
+    return result
+
+
+def open_bench_storage(backend, directory):
+    if backend == 'sqlite':
+        return SQLiteStorage(os.path.join(directory, 'recipes.db'))
+    # Benchmarks measure our code, not the disk, so journal fsyncs are off
+    return JournalStorage(os.path.join(directory, 'recipes.json'), fsync=False)
+
+
+def _prepare(backend, directory, size, seed, names):
+    """Create the catalogue for one size in directory, in the backend's format"""
+    recipes = generate_recipes(size, seed=seed, names=names)
+    if backend == 'sqlite':
+        storage = SQLiteStorage(os.path.join(directory, 'recipes.db'))
+        batch = []
+        for recipe_id, recipe in enumerate(recipes, 1):
+            batch.append({'id': recipe_id, **recipe})
+            if len(batch) >= 10000:
+                storage.put_many(batch)
+                batch = []
+        storage.put_many(batch)
+        storage.close()
+    else:
+        write_catalogue(os.path.join(directory, 'recipes.json'), recipes)
+
+
+def bench_size(size, backend='json', seed=0, names='random', samples=200, repeat=3, memory=True, workdir=None):
+    """Benchmark every operation at one catalogue size; returns the result dict"""
+    rng = random.Random(seed + size)
+    directory = tempfile.mkdtemp(prefix=f'recipe-bench-{size}-', dir=workdir)
+    timings = {}
+    try:
+        _prepare(backend, directory, size, seed, names)
+
+        load = []
+        for _ in range(repeat):
+            store = timed(load, RecipeStore(open_bench_storage(backend, directory)).load)
+            store.close()
+        timings['load'] = load
+
+        result = {}
+        if memory:
+            tracemalloc.start()
+            store = RecipeStore(open_bench_storage(backend, directory)).load()
+            result['load_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            tracemalloc.reset_peak()
+            store.build_indexes()
+            result['index_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            tracemalloc.stop()
+            store.close()
+
+        store = RecipeStore(open_bench_storage(backend, directory)).load()
+        timings['index_build'] = []
+        timed(timings['index_build'], store.build_indexes)
+
+        ids = list(store.recipes)
+        names_sample = [store.recipes[rng.choice(ids)]['name'] for _ in range(samples)]
+
+        timings['lookup'] = []
+        for name in names_sample:
+            timed(timings['lookup'], store.find, name.upper())
+
+        timings['substring'] = []
+        for name in names_sample:
+            start = rng.randrange(max(1, len(name) - 4))
+            timed(timings['substring'], store.search_names, name[start:start + rng.randint(3, 5)])
+
+        timings['prefix'] = []
+        for name in names_sample:
+            timed(timings['prefix'], store.search_names, name[:rng.randint(1, 2)])
+
+        # One typo (a dropped letter) in every word long enough to be misspelt
+        timings['fuzzy'] = []
+        for name in names_sample:
+            query = ' '.join(word[:1] + word[2:] if len(word) > 4 else word for word in name.split())
+            timed(timings['fuzzy'], store.search_fuzzy, query, 20)
+
+        # Label the rows a 30-row list window shows at a random scroll position,
+        # which is all VirtualList.render asks of the store
+        def refresh(top):
+            return [store.recipes[recipe_id]['name'] for recipe_id in store.sorted_ids[top:top + 30]]
+
+        timings['list_refresh'] = []
+        for _ in range(samples):
+            timed(timings['list_refresh'], refresh, rng.randrange(len(store.sorted_ids)))
+
+        extra = list(generate_recipes(samples, seed=seed + 7919, names='random'))
+        timings['insert'] = []
+        added = []
+        for recipe in extra:
+            name = f"{recipe['name']} Bench"
+            added.append(timed(timings['insert'], store.add, name, recipe['ingredients'], recipe['instructions']))
+
+        timings['edit'] = []
+        for recipe in added:
+            timed(
+                timings['edit'], store.update,
+                recipe['id'], recipe['name'] + ' Edited', recipe['ingredients'], recipe['instructions']
+            )
+
+        timings['delete'] = []
+        for recipe in added:
+            timed(timings['delete'], store.delete, recipe['id'])
+
+        timings['save'] = []
+        for _ in range(repeat):
+            timed(timings['save'], store.save)
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    result.update({operation: percentiles(samples_) for operation, samples_ in timings.items()})
+    return result
+
+
+def run(sizes=DEFAULT_SIZES, backend='json', seed=0, names='random', samples=200, repeat=3, memory=True,
+        progress=None):
+    results = {}
+    for size in sizes:
+        results[str(size)] = bench_size(size, backend, seed, names, samples, repeat, memory)
+        if progress is not None:
+            progress(size, results[str(size)])
+    return {
+        'meta': {
+            'backend': backend,
+            'names': names,
+            'seed': seed,
+            'samples': samples,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=1.25):
+    """Return (size, operation, baseline p50, current p50, ratio) for p50 slowdowns beyond threshold"""
+    regressions = []
+    for size, operations in current['results'].items():
+        base_operations = baseline.get('results', {}).get(size, {})
+        for operation, stats in operations.items():
+            base = base_operations.get(operation)
+            if not isinstance(stats, dict) or not isinstance(base, dict) or not base['p50']:
+                continue
+            ratio = stats['p50'] / base['p50']
+            if ratio > threshold:
+                regressions.append((size, operation, base['p50'], stats['p50'], round(ratio, 2)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic catalogues and benchmark the recipe store")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('generate', help="write a synthetic JSON catalogue")
+    p.add_argument('count', type=int)
+    p.add_argument('file')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--names', choices=NAME_DISTRIBUTIONS, default='random')
+    p.add_argument('--vocabulary', type=int, default=500, help="distinct ingredient words")
+
+    p = commands.add_parser('run', help="run the benchmarks and print JSON results")
+    p.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="comma-separated catalogue sizes")
+    p.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--names', choices=NAME_DISTRIBUTIONS, default='random')
+    p.add_argument('--samples', type=int, default=200, help="samples per operation")
+    p.add_argument('--repeat', type=int, default=3, help="runs of load and save")
+    p.add_argument('--no-memory', action='store_true', help="skip the traced (slower) memory pass")
+    p.add_argument('--out', help="write results to this file instead of stdout")
+    p.add_argument('--baseline', help="results file to compare against")
+    p.add_argument('--threshold', type=float, default=1.25, help="p50 slowdown ratio counted as a regression")
+
+    args = parser.parse_args(argv)
+    if args.command == 'generate':
+        recipes = generate_recipes(args.count, seed=args.seed, names=args.names, vocabulary=args.vocabulary)
+        print(f"Wrote {write_catalogue(args.file, recipes)} recipes to {args.file}")
+        return 0
+
+    results = run(
+        [int(size) for size in args.sizes.split(',')], args.backend, args.seed, args.names,
+        args.samples, args.repeat, not args.no_memory,
+        progress=lambda size, result: print(
+            f"{size}: load p50 {result['load']['p50']} ms, substring p50 {result['substring']['p50']} ms",
+            file=sys.stderr
+        )
+    )
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=4)
+    else:
+        print(json.dumps(results, indent=4))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for size, operation, before, after, ratio in regressions:
+            print(f"REGRESSION {size} {operation}: p50 {before} ms -> {after} ms ({ratio}x)", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+"""Memory-mapped binary catalogue (recipes.rcat) for near-instant startup.
+
+The file is written from the JSON catalogue by an export step
+(`python recipe_cli.py binary`) and rebuilt, on the compaction thread,
+whenever the journal is compacted. It records the size and mtime of the JSON snapshot it was built
+from, and JournalStorage ignores it once they no longer match. Opening it
+maps the file and reads the header; names, records and index postings are
+decoded from the map only when they are asked for.
+
+Layout (little-endian, every section 8-byte aligned):
+
+    header      magic "RCAT", version, section count, recipe count, next ID,
+                JSON snapshot size and mtime_ns
+    directory   (offset, length) of each section in SECTIONS order
+    ids         u32 recipe ID per row; rows are in casefolded-name order
+    names       u32 offsets[count + 1] + UTF-8 blob (the sorted name table)
+    records     u64 offset per row + bodies of u32 length, u16 ingredient
+                count, u16 instruction count, u32 string lengths, UTF-8 text;
+                the last string is the recipe's extra fields as JSON (or empty)
+    rows_by_id  u32 row per recipe ID (0xFFFFFFFF where there is none)
+    words, grams, tokens
+                prebuilt name (word prefix and trigram) and ingredient
+                indexes: u32 term offsets + sorted term blob + u32 posting
+                offsets + u32 postings (rows for names, IDs for tokens)
+    recipe_tokens
+                u32 offsets[count + 1] + u32 token numbers of each row
+"""
+import bisect
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from recipe_store import IngredientIndex, SearchIndex
+
+MAGIC = b'RCAT'
+VERSION = 2
+NO_ROW = 0xFFFFFFFF
+SECTIONS = (
+    'ids', 'name_offsets', 'names', 'record_offsets', 'records', 'rows_by_id',
+    'words.offsets', 'words.terms', 'words.posting_offsets', 'words.postings',
+    'grams.offsets', 'grams.terms', 'grams.posting_offsets', 'grams.postings',
+    'tokens.offsets', 'tokens.terms', 'tokens.posting_offsets', 'tokens.postings',
+    'recipe_tokens.offsets', 'recipe_tokens.values',
+)
+
+_HEADER = struct.Struct('<4sHHIIQQ')
+_SECTION = struct.Struct('<QQ')
+_BODY = struct.Struct('<HH')
+
+
+def _u32(values):
+    data = array('I', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _u64(values):
+    data = array('Q', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _string_table(strings):
+    """u32 offsets (count + 1) and the UTF-8 blob for a list of strings"""
+    offsets = [0]
+    blob = bytearray()
+    for text in strings:
+        blob += text.encode('utf-8')
+        offsets.append(len(blob))
+    return _u32(offsets), bytes(blob)
+
+
+def _term_table(postings):
+    """The four sections of a term table from a {term: array('I')} dict"""
+    terms = sorted(postings)
+    offsets, blob = _string_table(terms)
+    posting_offsets = [0]
+    values = array('I')
+    for term in terms:
+        values.extend(postings[term])
+        posting_offsets.append(len(values))
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return [offsets, blob, _u32(posting_offsets), values.tobytes()], terms
+
+
+def _record_body(recipe):
+    details = {key: recipe[key] for key in recipe.keys() if key not in CatalogueRecipe._KEYS}
+    extra = json.dumps(details, separators=(',', ':')) if details else ''
+    strings = [text.encode('utf-8') for text in (*recipe['ingredients'], *recipe['instructions'], extra)]
+    body = (
+        _BODY.pack(len(recipe['ingredients']), len(recipe['instructions']))
+        + _u32(len(data) for data in strings)
+        + b''.join(strings)
+    )
+    return struct.pack('<I', len(body)) + body
+
+
+def write_catalogue(path, recipes, source_stamp=(0, 0), next_id=None):
+    """Write recipes (dicts or records with IDs) as a binary catalogue at path.
+
+    source_stamp is the (size, mtime_ns) of the JSON snapshot the recipes
+    came from. Returns the number of recipes written.
+    """
+    rows = sorted(recipes, key=lambda recipe: recipe['name'].casefold())
+    count = len(rows)
+    ids = [recipe['id'] for recipe in rows]
+    if next_id is None:
+        next_id = max(ids, default=0) + 1
+
+    name_offsets, names = _string_table(recipe['name'] for recipe in rows)
+
+    record_offsets = []
+    records = bytearray()
+    for recipe in rows:
+        record_offsets.append(len(records))
+        records += _record_body(recipe)
+
+    rows_by_id = array('I', [NO_ROW]) * (max(ids, default=0) + 1)
+    for row, recipe_id in enumerate(ids):
+        rows_by_id[recipe_id] = row
+
+    # Name index: word prefixes and trigrams -> rows, as SearchIndex builds them
+    grams_of = SearchIndex()._grams_of
+    words = {}
+    grams = {}
+    for row, recipe in enumerate(rows):
+        key = recipe['name'].casefold()
+        for word in set(key.split()):
+            words.setdefault(word, array('I')).append(row)
+        for gram in grams_of(key):
+            grams.setdefault(gram, array('I')).append(row)
+
+    # Ingredient index: tokens -> recipe IDs, plus each row's token numbers
+    row_tokens = []
+    token_postings = {}
+    for recipe in rows:
+        found = {token for line in recipe['ingredients'] for token in IngredientIndex.tokenize(line)}
+        row_tokens.append(found)
+        for token in found:
+            token_postings.setdefault(token, array('I')).append(recipe['id'])
+    for postings in token_postings.values():
+        postings[:] = array('I', sorted(postings))
+    token_sections, token_terms = _term_table(token_postings)
+    token_number = {token: i for i, token in enumerate(token_terms)}
+    recipe_token_offsets = [0]
+    recipe_token_values = array('I')
+    for found in row_tokens:
+        recipe_token_values.extend(sorted(token_number[token] for token in found))
+        recipe_token_offsets.append(len(recipe_token_values))
+
+    sections = [
+        _u32(ids), name_offsets, names, _u64(record_offsets), bytes(records), _u32(rows_by_id),
+        *_term_table(words)[0], *_term_table(grams)[0], *token_sections,
+        _u32(recipe_token_offsets), _u32(recipe_token_values),
+    ]
+
+    position = _HEADER.size + _SECTION.size * len(sections)
+    directory = []
+    for data in sections:
+        position += -position % 8
+        directory.append((position, len(data)))
+        position += len(data)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(sections), count, next_id, *source_stamp))
+        for offset, length in directory:
+            f.write(_SECTION.pack(offset, length))
+        for (offset, _), data in zip(directory, sections):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(data)
+    return count
+
+
+class _Strings:
+    """Sequence view of a string table (works with bisect)"""
+
+    __slots__ = ('offsets', 'blob')
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+
+class _Keys:
+    """The sorted name table seen as casefolded keys (works with bisect)"""
+
+    __slots__ = ('names',)
+
+    def __init__(self, names):
+        self.names = names
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, row):
+        return self.names[row].casefold()
+
+
+class TermTable:
+    """A sorted term -> postings table inside the mapped file"""
+
+    def __init__(self, offsets, terms, posting_offsets, postings):
+        self.terms = _Strings(offsets, terms)
+        self.posting_offsets = posting_offsets
+        self.postings_view = postings
+
+    def __len__(self):
+        return len(self.terms)
+
+    def find(self, term):
+        """Index of term, or -1"""
+        i = bisect.bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def prefix_range(self, prefix):
+        """Indexes of every term starting with prefix"""
+        start = bisect.bisect_left(self.terms, prefix)
+        end = start
+        while end < len(self.terms) and self.terms[end].startswith(prefix):
+            end += 1
+        return range(start, end)
+
+    def postings(self, i):
+        """The postings of term i as a zero-copy u32 view"""
+        return self.postings_view[self.posting_offsets[i]:self.posting_offsets[i + 1]]
+
+    def lookup(self, term):
+        i = self.find(term)
+        return self.postings(i) if i >= 0 else self.postings_view[:0]
+
+
+class CatalogueRecipe:
+    """A catalogue row read like a recipe dict; the body is decoded on access"""
+
+    __slots__ = ('id', 'name', '_catalogue', '_row')
+
+    _KEYS = ('id', 'name', 'ingredients', 'instructions')
+
+    def __init__(self, catalogue, row):
+        self._catalogue = catalogue
+        self._row = row
+        self.id = catalogue.ids[row]
+        self.name = catalogue.names[row]
+
+    @property
+    def ingredients(self):
+        return self._catalogue.body(self._row)[0]
+
+    @property
+    def instructions(self):
+        return self._catalogue.body(self._row)[1]
+
+    @property
+    def details(self):
+        return self._catalogue.body(self._row)[2]
+
+    def keys(self):
+        details = self.details
+        return self._KEYS + tuple(details) if details else self._KEYS
+
+    def __getitem__(self, key):
+        if key in self._KEYS:
+            return getattr(self, key)
+        details = self.details
+        if details and key in details:
+            return details[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._KEYS or key in (self.details or ())
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def to_dict(self):
+        ingredients, instructions, details = self._catalogue.body(self._row)
+        recipe = {'id': self.id, 'name': self.name, 'ingredients': ingredients, 'instructions': instructions}
+        if details:
+            recipe.update(details)
+        return recipe
+
+    def __repr__(self):
+        return f"CatalogueRecipe(id={self.id!r}, name={self.name!r})"
+
+
+class BinaryCatalogue:
+    """Read-only, memory-mapped view of a recipes.rcat file"""
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("Binary catalogues are only supported on little-endian machines")
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty")
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        view = memoryview(self._map)
+        if len(view) < _HEADER.size:
+            raise ValueError(f"{self.path} is not a recipe catalogue")
+        magic, version, section_count, self.count, self.next_id, size, mtime_ns = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION or section_count != len(SECTIONS):
+            raise ValueError(f"{self.path} is not a version {VERSION} recipe catalogue")
+        self.source_stamp = (size, mtime_ns)
+
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = _SECTION.unpack_from(view, _HEADER.size + i * _SECTION.size)
+            if offset + length > len(view):
+                raise ValueError(f"{self.path} is truncated")
+            sections[name] = view[offset:offset + length]
+
+        self._views = [view, *sections.values()]
+
+        def u32(name):
+            cast = sections[name].cast('I')
+            self._views.append(cast)
+            return cast
+
+        self.ids = u32('ids')
+        self.names = _Strings(u32('name_offsets'), sections['names'])
+        self.keys = _Keys(self.names)
+        self._record_offsets = sections['record_offsets'].cast('Q')
+        self._views.append(self._record_offsets)
+        self._records = sections['records']
+        self._rows_by_id = u32('rows_by_id')
+        self.words, self.grams, self.tokens = (
+            TermTable(u32(f'{table}.offsets'), sections[f'{table}.terms'],
+                      u32(f'{table}.posting_offsets'), u32(f'{table}.postings'))
+            for table in ('words', 'grams', 'tokens')
+        )
+        self._recipe_token_offsets = u32('recipe_tokens.offsets')
+        self._recipe_token_values = u32('recipe_tokens.values')
+
+    def __len__(self):
+        return self.count
+
+    def row_of(self, recipe_id):
+        """Row of a recipe ID, or None"""
+        if 0 <= recipe_id < len(self._rows_by_id):
+            row = self._rows_by_id[recipe_id]
+            if row != NO_ROW:
+                return row
+        return None
+
+    def find_row(self, name):
+        """Row of a name (case-insensitive), or None"""
+        key = name.casefold()
+        row = bisect.bisect_left(self.keys, key)
+        if row < self.count and self.keys[row] == key:
+            return row
+        return None
+
+    def recipe(self, row):
+        return CatalogueRecipe(self, row)
+
+    def body(self, row):
+        """(ingredients, instructions, details or None) of a row, decoded from the map"""
+        start = self._record_offsets[row] + 4
+        n_ingredients, n_instructions = _BODY.unpack_from(self._records, start)
+        n = n_ingredients + n_instructions + 1
+        lengths = struct.unpack_from(f'<{n}I', self._records, start + _BODY.size)
+        position = start + _BODY.size + 4 * n
+        strings = []
+        for length in lengths:
+            strings.append(str(self._records[position:position + length], 'utf-8'))
+            position += length
+        extra = strings.pop()
+        return strings[:n_ingredients], strings[n_ingredients:], json.loads(extra) if extra else None
+
+    def row_tokens(self, row):
+        """Token numbers (into self.tokens) of a row's ingredients"""
+        return self._recipe_token_values[self._recipe_token_offsets[row]:self._recipe_token_offsets[row + 1]]
+
+    def close(self):
+        for view in reversed(getattr(self, '_views', ())):
+            view.release()
+        self._views = []
+        try:
+            self._map.close()
+        except BufferError:
+            # A caller still holds a postings view; the map is released with it
+            pass
+        self._file.close()
@@ -0,0 +1,274 @@
+"""Bulk import and export of recipe catalogues (JSON arrays, JSON lines, CSV).
+
+Import reads JSON-lines and CSV sources as raw lines, in chunks, and
+hands them to a process pool, which decodes and normalizes each record and
+hashes its casefolded name. A JSON array cannot be split without decoding
+it, so it is parsed in this process instead (use JSON lines for large
+feeds). The parent drops duplicates (against the catalogue and earlier
+records), then commits each batch to the store and its indexes with one
+storage write. Only a few chunks are in flight at a time, so memory stays
+bounded by the chunk size and the dedup set (about 75 bytes per name for
+the 8-byte digest object and its set entry) rather than the size of the
+feed.
+
+CSV files have a header with name, ingredients and instructions columns;
+list cells hold their items separated by CSV_LIST_SEPARATOR.
+"""
+import csv
+import hashlib
+import json
+import os
+import time
+from collections import deque
+
+from recipe_storage import iter_json_array
+
+FORMATS = ('json', 'jsonl', 'csv')
+CSV_LIST_SEPARATOR = '|'
+CSV_FIELDS = ('name', 'ingredients', 'instructions')
+
+
+def detect_format(path):
+    """Guess a file format from its extension (JSON array by default)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    return 'json'
+
+
+def name_digest(name):
+    """Dedup key: a short hash of the casefolded name"""
+    return hashlib.blake2b(name.casefold().encode('utf-8'), digest_size=8).digest()
+
+
+def _clean_name(name):
+    return ' '.join(str(name or '').split())
+
+
+def _clean_lines(value, separator='\n'):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(separator)
+    return [line for line in (str(item).strip() for item in value) if line]
+
+
+def normalize_record(raw, separator='\n'):
+    """Return (name digest, recipe) for a raw record, or None if it has no name"""
+    if not isinstance(raw, dict):
+        return None
+    name = _clean_name(raw.get('name'))
+    if not name:
+        return None
+    recipe = {
+        'name': name,
+        'ingredients': _clean_lines(raw.get('ingredients'), separator),
+        'instructions': _clean_lines(raw.get('instructions'), separator)
+    }
+    return name_digest(name), recipe
+
+
+def parse_chunk(fmt, chunk):
+    """Worker entry point: turn one chunk of raw input into normalized records.
+
+    JSON-lines chunks are undecoded lines, CSV chunks are undecoded lines
+    led by the header line and JSON array chunks are already-decoded
+    elements. Records that cannot be decoded or have no name come back as
+    None.
+    """
+    if fmt == 'csv':
+        return [normalize_record(row, CSV_LIST_SEPARATOR) for row in csv.DictReader(chunk)]
+    results = []
+    for item in chunk:
+        if fmt == 'jsonl':
+            try:
+                item = json.loads(item)
+            except ValueError:
+                results.append(None)
+                continue
+        results.append(normalize_record(item))
+    return results
+
+
+def iter_chunks(f, fmt, chunk_size):
+    """Yield lists of raw records from an open file, chunk_size at a time"""
+    if fmt == 'csv':
+        yield from _csv_chunks(f, chunk_size)
+        return
+    if fmt == 'jsonl':
+        items = (line for line in f if line.strip())
+    else:
+        items = iter_json_array(f)
+
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_chunks(f, chunk_size):
+    """Header-led lists of raw CSV lines, each ending on a row boundary.
+
+    A quoted field may hold line breaks, so a chunk only ends where the
+    quotes seen so far are balanced ("" inside a field counts twice).
+    """
+    header = f.readline()
+    chunk, quotes = [header], 0
+    for line in f:
+        chunk.append(line)
+        quotes += line.count('"')
+        if len(chunk) > chunk_size and not quotes % 2:
+            yield chunk
+            chunk, quotes = [header], 0
+    if len(chunk) > 1:
+        yield chunk
+
+
+def _parsed_chunks(chunks, fmt, workers):
+    """Parse chunks in a process pool, in order, with a bounded number in flight"""
+    if not workers or fmt == 'json':
+        # Array elements arrive decoded; shipping them to workers costs more than it saves
+        for chunk in chunks:
+            yield parse_chunk(fmt, chunk)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(parse_chunk, fmt, chunk))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+class ImportReport:
+    """Counts and throughput for one bulk import"""
+
+    def __init__(self):
+        self.read = 0
+        self.added = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def records_per_sec(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'added': self.added,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'seconds': round(self.seconds, 3),
+            'records_per_sec': round(self.records_per_sec, 1),
+        }
+
+    def __str__(self):
+        return (
+            f"Read {self.read} records in {self.seconds:.2f}s ({self.records_per_sec:,.0f} records/sec): "
+            f"{self.added} added, {self.duplicates} duplicates, {self.invalid} invalid"
+        )
+
+
+def bulk_import(store, path, fmt=None, workers=None, chunk_size=2000, batch_size=5000, progress=None):
+    """Import a catalogue file into store; returns an ImportReport.
+
+    workers=None uses one process per CPU and workers=0 parses in this
+    process, as JSON arrays always are. progress(report) is called after each committed batch. The
+    store is saved (journal compacted) once at the end.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    report = ImportReport()
+    seen = {name_digest(_clean_name(recipe['name'])) for recipe in store.recipes.values()}
+    batch = []
+
+    def commit():
+        store.add_many(batch)
+        report.added += len(batch)
+        report.seconds = time.perf_counter() - report.started
+        batch.clear()
+        if progress is not None:
+            progress(report)
+
+    newline = '' if fmt == 'csv' else None
+    with open(path, 'r', encoding='utf-8', newline=newline) as f:
+        for results in _parsed_chunks(iter_chunks(f, fmt, chunk_size), fmt, workers):
+            for result in results:
+                report.read += 1
+                if result is None:
+                    report.invalid += 1
+                    continue
+                digest, recipe = result
+                if digest in seen:
+                    report.duplicates += 1
+                    continue
+                seen.add(digest)
+                batch.append(recipe)
+                if len(batch) >= batch_size:
+                    commit()
+    if batch:
+        commit()
+    store.save()
+    report.seconds = time.perf_counter() - report.started
+    return report
+
+
+def export_recipes(store, path, fmt=None, recipe_ids=None):
+    """Stream recipes (all, in name order, by default) to a file; returns the count.
+
+    Recipes are fetched and written one at a time, so instructions held in
+    SQLite are never all in memory at once.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    recipe_ids = store.sorted_ids if recipe_ids is None else recipe_ids
+
+    count = 0
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='' if fmt == 'csv' else None) as f:
+            if fmt == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(CSV_FIELDS)
+            elif fmt == 'json':
+                f.write('[')
+            for recipe_id in recipe_ids:
+                recipe = store.get(recipe_id)
+                if fmt == 'csv':
+                    writer.writerow((
+                        recipe['name'],
+                        CSV_LIST_SEPARATOR.join(recipe['ingredients']),
+                        CSV_LIST_SEPARATOR.join(recipe['instructions'])
+                    ))
+                elif fmt == 'jsonl':
+                    f.write(json.dumps(recipe) + '\n')
+                else:
+                    f.write(',\n' if count else '\n')
+                    json.dump(recipe, f)
+                count += 1
+            if fmt == 'json':
+                f.write('\n]\n')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
@@ -0,0 +1,176 @@
+"""Command-line access to the recipe catalogue without the Tk GUI.
+
+    python recipe_cli.py import more_recipes.json
+    python recipe_cli.py import supplier_feed.jsonl --workers 8
+    python recipe_cli.py search "chick" --mode name
+    python recipe_cli.py search "chiken tika" --mode fuzzy
+    python recipe_cli.py search "flour, eggs, -milk" --mode ingredients
+    python recipe_cli.py related "Chicken Tikka Masala"
+    python recipe_cli.py export all_recipes.csv
+    python recipe_cli.py stats
+    python recipe_cli.py binary
+    python recipe_cli.py enrich --workers 4 --rpm 60
+"""
+import argparse
+import sys
+import time
+
+from recipe_storage import open_storage
+from recipe_store import RecipeStore
+
+
+def open_store(args):
+    return RecipeStore(open_storage(args.catalogue, args.db)).load()
+
+
+def cmd_import(store, args):
+    from recipe_bulk import bulk_import
+
+    report = bulk_import(
+        store, args.file, fmt=args.format, workers=args.workers,
+        progress=(lambda report: print(report, file=sys.stderr)) if args.verbose else None
+    )
+    print(report)
+
+
+def cmd_search(store, args):
+    if args.mode == 'ingredients':
+        rows = [(recipe_id, None) for recipe_id in store.search_ingredients(args.query)]
+    elif args.mode == 'cook':
+        rows = [(recipe_id, f"{matched}/{total}") for recipe_id, matched, total in store.can_make(args.query)]
+    elif args.mode == 'text':
+        rows = [(recipe_id, None) for recipe_id in store.search_text(args.query)]
+    elif args.mode == 'fuzzy':
+        rows = [(recipe_id, None) for recipe_id in store.search_fuzzy(args.query, args.limit)]
+    else:
+        rows = [(recipe_id, None) for recipe_id in store.search_names(args.query)]
+
+    for recipe_id, note in rows[:args.limit]:
+        name = store.recipes[recipe_id]['name']
+        print(f"{recipe_id}\t{name}" + (f"\t{note}" if note else ''))
+    if len(rows) > args.limit:
+        print(f"... {len(rows) - args.limit} more", file=sys.stderr)
+
+
+def cmd_related(store, args):
+    recipe = store.find(args.name)
+    if recipe is None:
+        raise ValueError(f"No recipe named '{args.name}'")
+    for recipe_id in store.related(recipe['id'], args.limit):
+        print(f"{recipe_id}\t{store.recipes[recipe_id]['name']}")
+
+
+def cmd_export(store, args):
+    from recipe_bulk import export_recipes
+
+    started = time.perf_counter()
+    count = export_recipes(store, args.file, fmt=args.format)
+    seconds = time.perf_counter() - started
+    print(f"Exported {count} recipes to {args.file} in {seconds:.2f}s ({count / (seconds or 1e-9):,.0f} records/sec)")
+
+
+def cmd_stats(store, args):
+    for key, value in store.stats().items():
+        print(f"{key}: {value}")
+
+
+def cmd_binary(store, args):
+    if not hasattr(store.storage, 'write_binary'):
+        raise ValueError("Binary catalogues are built from the JSON catalogue, not SQLite")
+    started = time.perf_counter()
+    store.save()
+    store.storage.write_binary(store.recipes.values())
+    seconds = time.perf_counter() - started
+    print(f"Wrote {store.storage.binary_path} ({len(store.recipes)} recipes) in {seconds:.2f}s")
+
+
+def cmd_enrich(store, args):
+    from recipe_ai import FakeModel, create_model
+    from recipe_enrich import BATCH_SIZE, EnrichmentJob, fake_reply
+
+    if args.fake_ai:
+        model = FakeModel(latency=args.fake_latency, reply=fake_reply, failure_rate=args.fake_failure_rate)
+    else:
+        model = create_model()
+    job = EnrichmentJob(
+        store, model, batch_size=args.batch_size or BATCH_SIZE, workers=args.workers,
+        requests_per_minute=args.rpm, checkpoint=args.checkpoint
+    )
+    report = job.run(
+        limit=args.limit, retry_failed=args.retry_failed,
+        progress=(lambda report: print(report, file=sys.stderr)) if args.verbose else None
+    )
+    # The journal is compacted in the background; report a failure here
+    store.storage.wait()
+    print(report)
+    if job.checkpoint.failed:
+        print(f"{len(job.checkpoint.failed)} recipes failed; rerun with --retry-failed to try them again",
+              file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Manage the recipe catalogue from the command line")
+    parser.add_argument('--catalogue', default='recipes.json', help="JSON catalogue (default: recipes.json)")
+    parser.add_argument('--db', default='recipes.db', help="SQLite catalogue, used if it exists (default: recipes.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('import', help="add recipes from a JSON, JSON-lines or CSV file")
+    p.add_argument('file')
+    p.add_argument('--format', choices=('json', 'jsonl', 'csv'), help="input format (default: from the file extension)")
+    p.add_argument('--workers', type=int, help="parser processes (default: one per CPU, 0 to parse inline)")
+    p.add_argument('-v', '--verbose', action='store_true', help="report progress after each batch")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser('search', help="search recipes")
+    p.add_argument('query')
+    p.add_argument('--mode', choices=('name', 'fuzzy', 'ingredients', 'cook', 'text'), default='name')
+    p.add_argument('--limit', type=int, default=50)
+    p.set_defaults(func=cmd_search)
+
+    p = commands.add_parser('related', help="list recipes with similar ingredients")
+    p.add_argument('name')
+    p.add_argument('--limit', type=int, default=10)
+    p.set_defaults(func=cmd_related)
+
+    p = commands.add_parser('export', help="write the catalogue as JSON, JSON lines or CSV")
+    p.add_argument('file')
+    p.add_argument('--format', choices=('json', 'jsonl', 'csv'), help="output format (default: from the file extension)")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser('stats', help="show catalogue statistics")
+    p.set_defaults(func=cmd_stats)
+
+    p = commands.add_parser('binary', help="build the memory-mapped catalogue loaded at startup")
+    p.set_defaults(func=cmd_binary)
+
+    p = commands.add_parser('enrich', help="fill in cooking times, tags and plain ingredient lists with AI")
+    p.add_argument('--batch-size', type=int, help="recipes per prompt (default: 10)")
+    p.add_argument('--workers', type=int, default=4, help="prompts in progress at once (default: 4)")
+    p.add_argument('--rpm', type=float, default=60, help="model requests per minute (default: 60)")
+    p.add_argument('--limit', type=int, help="enrich at most this many recipes")
+    p.add_argument('--checkpoint', default='enrich_checkpoint.jsonl',
+                   help="progress log used to resume (default: enrich_checkpoint.jsonl)")
+    p.add_argument('--retry-failed', action='store_true', help="try again recipes that failed in earlier runs")
+    p.add_argument('--fake-ai', action='store_true', help="use the offline stub model")
+    p.add_argument('--fake-latency', type=float, default=0.5, help="stub model seconds per prompt (default: 0.5)")
+    p.add_argument('--fake-failure-rate', type=float, default=0.0, help="fraction of stub prompts that fail")
+    p.add_argument('-v', '--verbose', action='store_true', help="report progress after each batch")
+    p.set_defaults(func=cmd_enrich)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = open_store(args)
+    try:
+        args.func(store, args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
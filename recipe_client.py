@@ -0,0 +1,263 @@
+"""RemoteStore: the RecipeStore interface, served by a recipe_server.py process.
+
+The Tk app runs unchanged against it (python Index1.py --server=URL). The
+client keeps only a name list (recipes and sorted_ids, for the virtual
+list); searches, details and edits are requests to the server, which
+enforces unique names and writes the catalogue. refresh() folds in edits
+made by other terminals since the last call.
+"""
+import bisect
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+
+class RemoteStore:
+    """Client of a CatalogueServer that reads like a loaded RecipeStore"""
+
+    PAGE_SIZE = 5000
+
+    def __init__(self, url, timeout=30):
+        url = urlsplit(url)
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or 80
+        self.timeout = timeout
+        self.recipes = {}     # recipe ID -> {'id', 'name'}
+        self.sorted_ids = []  # recipe IDs in name order, kept in place like RecipeStore's
+        self.version = 0      # the server's catalogue version the name list reflects
+        self.epoch = None     # the server run that version belongs to
+        self.load_progress = 0.0
+        # The GUI reads load progress and the full-text flag from store.storage
+        self.storage = self
+        self._local = threading.local()  # one keep-alive connection per thread
+        self._assistant = None
+        # Fails fast if the server is not running
+        self.supports_fulltext = self.status()['supports_fulltext']
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def _request(self, method, path, body=None):
+        """Send one request and return the decoded reply; server errors raise ValueError/KeyError"""
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                status, payload = response.status, json.loads(response.read() or b'null')
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # A restarted server drops kept-alive connections; retry once on a
+                # new one, unless the request might already have added a recipe
+                connection.close()
+                self._local.connection = None
+                if attempt or method == 'POST':
+                    raise ConnectionError(f"Lost the connection to the catalogue server at {self.host}:{self.port}")
+        if status == 404:
+            raise KeyError(payload.get('error', path))
+        if status >= 400:
+            raise ValueError(payload.get('error', f"Server error {status}"))
+        return payload
+
+    # Name list
+
+    def sorted_row(self, name):
+        """Position of a name in sorted_ids (or where it would be inserted)"""
+        return bisect.bisect_left(
+            self.sorted_ids, name.casefold(),
+            key=lambda recipe_id: self.recipes[recipe_id]['name'].casefold()
+        )
+
+    def _upsert(self, recipe_id, name):
+        old = self.recipes.get(recipe_id)
+        if old is not None:
+            if old['name'] == name:
+                return
+            del self.sorted_ids[self.sorted_row(old['name'])]
+        self.recipes[recipe_id] = {'id': recipe_id, 'name': name}
+        self.sorted_ids.insert(self.sorted_row(name), recipe_id)
+
+    def _remove(self, recipe_id):
+        old = self.recipes.get(recipe_id)
+        if old is not None:
+            del self.sorted_ids[self.sorted_row(old['name'])]
+            del self.recipes[recipe_id]
+
+    def _known(self, rows):
+        """IDs of [id, name, ...] rows, adding any the name list has not caught up with"""
+        for row in rows:
+            if row[0] not in self.recipes:
+                self._upsert(row[0], row[1])
+        return [row[0] for row in rows]
+
+    def iter_load(self, batch_size=PAGE_SIZE):
+        """Fetch the name list page by page, yielding each page as it arrives"""
+        self.recipes.clear()
+        del self.sorted_ids[:]
+        self.load_progress = 0.0
+        after = None
+        version = None
+        while True:
+            query = {'limit': batch_size}
+            if after is not None:
+                query['after'] = after
+            page = self._request('GET', '/recipes?' + urlencode(query))
+            if version is None:
+                version = page['version']
+                self.epoch = page['epoch']
+            batch = [{'id': recipe_id, 'name': name} for recipe_id, name in page['recipes']]
+            for recipe in batch:
+                self.recipes[recipe['id']] = recipe
+                self.sorted_ids.append(recipe['id'])
+            self.load_progress = min(1.0, len(self.sorted_ids) / (page['total'] or 1))
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                break
+            after = batch[-1]['name']
+        self.load_progress = 1.0
+        # Edits made while paging come in through the change log
+        self.version = version
+        self.refresh()
+
+    def load(self):
+        for _ in self.iter_load():
+            pass
+        return self
+
+    def refresh(self):
+        """Apply edits made through the server since the last refresh; True if any were"""
+        query = {'since': self.version}
+        if self.epoch is not None:
+            query['epoch'] = self.epoch
+        reply = self._request('GET', '/changes?' + urlencode(query))
+        if reply.get('reset'):
+            for _ in self.iter_load():
+                pass
+            return True
+        for _, recipe_id, name in reply['changes']:
+            if name is None:
+                self._remove(recipe_id)
+            else:
+                self._upsert(recipe_id, name)
+        self.version = reply['version']
+        return bool(reply['changes'])
+
+    def build_indexes(self):
+        """The server holds the indexes"""
+
+    def prepare_related_index(self):
+        return _ServerRelatedIndex(self)
+
+    # Reads
+
+    def get(self, recipe_id):
+        return self._request('GET', f'/recipes/{recipe_id}')
+
+    def find(self, name):
+        try:
+            return self._request('GET', '/find?' + urlencode({'name': name}))
+        except KeyError:
+            return None
+
+    def _search(self, mode, query, limit=None):
+        params = {'mode': mode, 'q': query}
+        if limit is not None:
+            params['limit'] = limit
+        return self._request('GET', '/search?' + urlencode(params))['results']
+
+    def search_names(self, query):
+        return self._known(self._search('name', query))
+
+    def search_fuzzy(self, query, limit=50):
+        return self._known(self._search('fuzzy', query, limit))
+
+    def search_ingredients(self, query):
+        return self._known(self._search('ingredients', query))
+
+    def search_text(self, query):
+        return self._known(self._search('text', query))
+
+    def can_make(self, pantry):
+        rows = self._search('cook', pantry)
+        self._known(rows)
+        return [(recipe_id, matched, total) for recipe_id, _, matched, total in rows]
+
+    def related(self, recipe_id, limit=None):
+        query = f'?limit={limit}' if limit is not None else ''
+        return self._known(self._request('GET', f'/related/{recipe_id}{query}')['results'])
+
+    def status(self):
+        """The server's cheap status: epoch, version and readiness flags"""
+        return self._request('GET', '/status')
+
+    def stats(self):
+        return self._request('GET', '/stats')
+
+    # Edits (the server persists them; the name list is updated right away)
+
+    def add(self, name, ingredients, instructions):
+        recipe = self._request('POST', '/recipes', {
+            'name': name, 'ingredients': list(ingredients), 'instructions': list(instructions)
+        })
+        self._upsert(recipe['id'], recipe['name'])
+        return recipe
+
+    def update(self, recipe_id, name, ingredients, instructions, details=None):
+        body = {'name': name, 'ingredients': list(ingredients), 'instructions': list(instructions)}
+        if details is not None:
+            body['details'] = details
+        recipe = self._request('PUT', f'/recipes/{recipe_id}', body)
+        self._upsert(recipe_id, recipe['name'])
+        return recipe
+
+    def delete(self, recipe_id):
+        recipe = self._request('DELETE', f'/recipes/{recipe_id}')
+        self._remove(recipe_id)
+        return recipe
+
+    def save(self):
+        """The server compacts its own journal"""
+
+    def assistant(self, model=None, cache=None):
+        """The AI assistant runs in the client, as with a local store"""
+        if self._assistant is None:
+            from recipe_ai import AssistantService, create_model
+
+            self._assistant = AssistantService(model if model is not None else create_model(), cache=cache)
+        return self._assistant
+
+    def close(self):
+        if self._assistant is not None:
+            self._assistant.shutdown()
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+
+
+class _ServerRelatedIndex:
+    """What prepare_related_index() returns: the server builds the lists itself"""
+
+    POLL_SECONDS = 0.5
+
+    def __init__(self, store):
+        self.store = store
+
+    def compute(self):
+        # Wait, off the GUI thread, until the server's build has finished
+        while True:
+            status = self.store.status()
+            if status['related'] == 'ready':
+                return
+            if status['related'] == 'failed':
+                raise ValueError(status['related_error'])
+            time.sleep(self.POLL_SECONDS)
+
+    def finish(self):
+        pass
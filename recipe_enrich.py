@@ -0,0 +1,391 @@
+"""Batch AI enrichment: fill in cooking times, tags and plain ingredient lists.
+
+EnrichmentJob walks the recipes that are missing any of FIELDS, sends them
+to the model BATCH_SIZE to a prompt, and writes each batch's answers back
+with store.update_many(), so they reach the journal or SQLite and every
+index just like an edit (the journal is compacted once, at the end).
+Prompts go out from a small thread pool behind a token bucket sized to
+the model's requests-per-minute quota; failed prompts are retried with
+exponential backoff and jitter. Finished recipes are appended to a
+checkpoint log after every batch, so an interrupted run picks up where it
+stopped.
+
+    python recipe_cli.py enrich --workers 4 --rpm 60
+    python recipe_cli.py enrich --fake-ai --limit 500
+"""
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from recipe_store import IngredientIndex
+
+FIELDS = ('cook_time', 'tags', 'normalized_ingredients')
+BATCH_SIZE = 10
+MAX_TAGS = 8
+MAX_COOK_TIME = 48 * 60  # minutes; longer answers are treated as nonsense
+
+RECIPES_MARKER = "Recipes:\n"
+ENRICH_PROMPT = (
+    "For each recipe below, estimate the total cooking time in minutes, give up to "
+    "five short lowercase tags (cuisine, course, diet, technique) and list the "
+    "ingredients as plain names without quantities or preparation notes.\n"
+    "Answer with only a JSON array holding one object per recipe, in the form "
+    '{{"id": <recipe id>, "cook_time": <minutes>, "tags": [...], "ingredients": [...]}}.\n\n'
+    + RECIPES_MARKER + "{recipes}"
+)
+_PROMPT_HEAD = ENRICH_PROMPT.format(recipes='')
+
+
+def build_prompt(recipes):
+    """One prompt covering a batch of full recipe dicts"""
+    items = [
+        {key: recipe[key] for key in ('id', 'name', 'ingredients', 'instructions')}
+        for recipe in recipes
+    ]
+    return ENRICH_PROMPT.format(recipes=json.dumps(items, ensure_ascii=False))
+
+
+def parse_reply(text):
+    """The JSON array in a model reply (code fences and chatter around it are skipped)"""
+    start, end = text.find('['), text.rfind(']')
+    if start < 0 or end < start:
+        raise ValueError("The reply holds no JSON array")
+    items = json.loads(text[start:end + 1])
+    if not isinstance(items, list):
+        raise ValueError("The reply is not a JSON array")
+    return items
+
+
+def _clean_list(value, limit=None):
+    if not isinstance(value, list):
+        return None
+    items = []
+    for item in value:
+        item = ' '.join(str(item).split()).casefold()
+        if item and item not in items:
+            items.append(item)
+    return items[:limit] or None
+
+
+def clean_details(item):
+    """The usable FIELDS of one answer object, in the form they are stored"""
+    details = {}
+    try:
+        cook_time = round(float(item.get('cook_time')))
+    except (TypeError, ValueError, OverflowError):
+        cook_time = None
+    if cook_time is not None and 0 < cook_time <= MAX_COOK_TIME:
+        details['cook_time'] = cook_time
+    tags = _clean_list(item.get('tags'), MAX_TAGS)
+    if tags:
+        details['tags'] = tags
+    ingredients = _clean_list(item.get('ingredients'))
+    if ingredients:
+        details['normalized_ingredients'] = ingredients
+    return details
+
+
+def fake_reply(prompt):
+    """Offline stand-in for the model (FakeModel(reply=fake_reply)): answers derived from the prompt"""
+    if not prompt.startswith(_PROMPT_HEAD):
+        return f"(fake model) {prompt}"
+    recipes = json.loads(prompt[len(_PROMPT_HEAD):])
+    answers = [
+        {
+            'id': recipe['id'],
+            'cook_time': 10 + 5 * len(recipe['instructions']),
+            'tags': sorted(IngredientIndex.tokenize(recipe['name']))[:3],
+            'ingredients': sorted(IngredientIndex.tokenize(' '.join(recipe['ingredients']))),
+        }
+        for recipe in recipes
+    ]
+    return "```json\n" + json.dumps(answers, indent=2) + "\n```"
+
+
+class TokenBucket:
+    """Thread-safe rate limiter: rate tokens per second, bursts of up to capacity"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancelled=None):
+        """Block until a token is free; False if cancelled (an Event) is set first"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                delay = (1 - self.tokens) / self.rate
+            if cancelled is None:
+                time.sleep(delay)
+            elif cancelled.wait(delay):
+                return False
+
+
+class Checkpoint:
+    """Append-only JSON-lines log of finished recipes, replayed on resume.
+
+    Each line holds an ID, the recipe's name then and, for a recipe that
+    could not be fully enriched, the error; later lines win. An entry only
+    covers a recipe with the same ID and name (see covers()), so a recipe
+    renamed since, or one that got the ID of a deleted recipe in a catalogue
+    saved before IDs were kept unique, is looked at again. A torn last line
+    from a crash is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.failed = {}  # recipe ID -> error
+        self.names = {}  # recipe ID -> name when it was logged (None in old logs)
+        if path is not None and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._note(entry['id'], entry.get('name'), entry.get('error'))
+
+    def _note(self, recipe_id, name, error):
+        self.names[recipe_id] = name
+        if error is None:
+            self.done.add(recipe_id)
+            self.failed.pop(recipe_id, None)
+        else:
+            self.done.discard(recipe_id)
+            self.failed[recipe_id] = error
+
+    def covers(self, recipe_id, name):
+        """True if the entry logged for recipe_id was about the recipe called name"""
+        return self.names.get(recipe_id, name) in (None, name)
+
+    def record(self, entries):
+        """Log (recipe ID, name, error or None) entries with a single write and fsync"""
+        for recipe_id, name, error in entries:
+            self._note(recipe_id, name, error)
+        if self.path is None or not entries:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(
+                json.dumps({'id': recipe_id, 'name': name, 'error': error}) + '\n'
+                for recipe_id, name, error in entries
+            ))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class EnrichmentReport:
+    """Counts and throughput for one enrichment run"""
+
+    def __init__(self):
+        self.requested = 0
+        self.enriched = 0
+        self.failed = 0
+        self.skipped = 0
+        self.prompts = 0
+        self.retries = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def recipes_per_sec(self):
+        return self.enriched / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'requested': self.requested,
+            'enriched': self.enriched,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'prompts': self.prompts,
+            'retries': self.retries,
+            'seconds': round(self.seconds, 3),
+            'recipes_per_sec': round(self.recipes_per_sec, 2),
+        }
+
+    def __str__(self):
+        return (
+            f"Enriched {self.enriched} of {self.requested} recipes in {self.seconds:.2f}s "
+            f"({self.recipes_per_sec:,.1f} recipes/sec): {self.failed} failed, {self.skipped} skipped, "
+            f"{self.prompts} prompts, {self.retries} retries"
+        )
+
+
+class EnrichmentJob:
+    """One enrichment pass over a store.
+
+    lock guards store reads when other threads use the store as well (the
+    GUI passes its store_lock). Writes go through edit(fn), which runs fn
+    wherever the store may be changed and returns its result; by default
+    that is the job's own thread, under lock. The GUI hands them to its
+    main loop, which also reads the store without locking. At most
+    workers * 2 batches are in flight. cancel() stops handing out prompts;
+    answers already received are still written back.
+    """
+
+    def __init__(self, store, model, batch_size=BATCH_SIZE, workers=4, requests_per_minute=60,
+                 max_retries=5, base_delay=1.0, max_delay=60.0, checkpoint='enrich_checkpoint.jsonl', lock=None,
+                 edit=None):
+        self.store = store
+        self.model = model
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(requests_per_minute / 60)
+        self.checkpoint = Checkpoint(checkpoint)
+        self.lock = lock if lock is not None else contextlib.nullcontext()
+        self.edit = edit or self._edit
+        self._cancelled = threading.Event()
+        self._random = random.Random()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _edit(self, fn):
+        with self.lock:
+            return fn()
+
+    def pending(self, limit=None, retry_failed=False):
+        """IDs of recipes still missing a field, in name order, minus checkpointed ones"""
+        skip = set(self.checkpoint.done)
+        if not retry_failed:
+            skip.update(self.checkpoint.failed)
+        fields = set(FIELDS)
+        recipe_ids = []
+        with self.lock:
+            for recipe_id in self.store.sorted_ids:
+                recipe = self.store.recipes[recipe_id]
+                if fields.issubset(recipe.keys()):
+                    continue
+                if recipe_id in skip and self.checkpoint.covers(recipe_id, recipe.name):
+                    continue
+                recipe_ids.append(recipe_id)
+        return recipe_ids if limit is None else recipe_ids[:limit]
+
+    def run(self, limit=None, retry_failed=False, progress=None):
+        """Enrich pending recipes; returns an EnrichmentReport.
+
+        progress(report) is called after each batch is written back.
+        """
+        report = EnrichmentReport()
+        recipe_ids = self.pending(limit, retry_failed)
+        report.requested = len(recipe_ids)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = set()
+            try:
+                for i in range(0, len(recipe_ids), self.batch_size):
+                    if self._cancelled.is_set():
+                        break
+                    with self.lock:
+                        batch = [
+                            self.store.get(recipe_id) for recipe_id in recipe_ids[i:i + self.batch_size]
+                            if recipe_id in self.store.recipes
+                        ]
+                    report.skipped += min(self.batch_size, len(recipe_ids) - i) - len(batch)
+                    if not batch:
+                        continue
+                    prompt = build_prompt(batch)
+                    in_flight.add(executor.submit(self._ask, [recipe['id'] for recipe in batch], prompt))
+                    while len(in_flight) >= self.workers * 2:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            self._apply(*future.result(), report, progress)
+                while in_flight:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        self._apply(*future.result(), report, progress)
+            except BaseException:
+                # Interrupted (e.g. Ctrl-C): wake the workers so the pool can shut down
+                self.cancel()
+                raise
+
+        if report.enriched:
+            # Edits never compact; fold the journal once, without holding up readers
+            self.edit(lambda: self.store.save(background=True))
+        report.seconds = time.perf_counter() - report.started
+        return report
+
+    def _backoff(self, attempt):
+        # Full exponential delay, scaled down by up to half so workers spread out
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * self._random.uniform(0.5, 1.0)
+
+    def _ask(self, batch, prompt):
+        """Worker: (batch, answers or None, error or None, prompts sent); neither when cancelled"""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if not self.bucket.acquire(self._cancelled):
+                return batch, None, None, attempt
+            try:
+                return batch, parse_reply(self.model.generate_content(prompt).text), None, attempt + 1
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempt < self.max_retries and self._cancelled.wait(self._backoff(attempt)):
+                return batch, None, None, attempt + 1
+        return batch, None, error, self.max_retries + 1
+
+    def _apply(self, batch, answers, error, prompts, report, progress):
+        """Write one batch's answers back to the store and checkpoint them"""
+        report.prompts += prompts
+        report.retries += max(0, prompts - 1)
+        if answers is None and error is None:
+            return
+
+        by_id = {}
+        for item in answers or ():
+            if isinstance(item, dict):
+                try:
+                    by_id[int(item.get('id'))] = item
+                except (TypeError, ValueError):
+                    pass
+
+        def write_back():
+            entries = []
+            changes = []
+            for recipe_id in batch:
+                if recipe_id not in self.store.recipes:
+                    report.skipped += 1
+                    continue
+                name = self.store.recipes[recipe_id].name
+                if error is not None:
+                    entries.append((recipe_id, name, error))
+                    continue
+                item = by_id.get(recipe_id)
+                details = clean_details(item) if item is not None else {}
+                if not details:
+                    failure = "no usable answer" if item is not None else "missing from the answer"
+                    entries.append((recipe_id, name, failure))
+                    continue
+                recipe = self.store.get(recipe_id)
+                # Only fill gaps; fields a person already set are kept
+                details = {key: value for key, value in details.items() if key not in recipe}
+                if details:
+                    changes.append({**recipe, 'details': details})
+                # A partial answer counts as failed, so --retry-failed asks again
+                missing = [field for field in FIELDS if field not in recipe and field not in details]
+                entries.append((recipe_id, name, f"no usable {', '.join(missing)}" if missing else None))
+            self.store.update_many(changes)
+            return entries
+
+        entries = self.edit(write_back)
+        self.checkpoint.record(entries)
+
+        report.enriched += sum(1 for _, _, failure in entries if failure is None)
+        report.failed += sum(1 for _, _, failure in entries if failure is not None)
+        report.seconds = time.perf_counter() - report.started
+        if progress is not None:
+            progress(report)
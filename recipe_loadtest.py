@@ -0,0 +1,205 @@
+"""Load test for recipe_server.py: requests/sec and latency under a read/write mix.
+
+    python recipe_server.py --catalogue big.json &
+    python recipe_loadtest.py http://127.0.0.1:8765 --connections 32 --duration 10
+    python recipe_loadtest.py http://127.0.0.1:8765 --processes 4 --writes 0.05 --out load.json
+
+Every connection is a keep-alive HTTP/1.1 client sending requests back to
+back, drawn from OPERATIONS by weight: name searches on word prefixes,
+detail fetches, fuzzy and ingredient searches and related lists. With
+--writes that fraction of requests instead PUT a recipe back unchanged,
+so the catalogue stays the same while every write still goes through the
+write lock and the journal. One Python process runs out of CPU well
+before the server does, so --processes spreads the connections over
+several generator processes. Latency percentiles are in milliseconds.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from multiprocessing import Pool
+from urllib.parse import urlencode, urlsplit
+
+from recipe_bench import percentiles
+from recipe_client import RemoteStore
+from recipe_store import IngredientIndex
+
+OPERATIONS = (
+    ('search_name', 40),
+    ('get', 25),
+    ('search_fuzzy', 10),
+    ('search_ingredients', 15),
+    ('related', 10),
+)
+SAMPLE_RECIPES = 200  # recipes fetched in full to draw queries and writes from
+
+
+def sample_workload(url, seed=0):
+    """Names, IDs, ingredient words and full recipes to build requests from"""
+    store = RemoteStore(url).load()
+    try:
+        ids = list(store.sorted_ids)
+        if not ids:
+            raise ValueError("The server's catalogue is empty")
+        rng = random.Random(seed)
+        recipes = [store.get(recipe_id) for recipe_id in rng.sample(ids, min(SAMPLE_RECIPES, len(ids)))]
+    finally:
+        store.close()
+    words = sorted({token for recipe in recipes for token in IngredientIndex.tokenize(' '.join(recipe['ingredients']))})
+    return {
+        'ids': ids,
+        'names': [store.recipes[recipe_id]['name'] for recipe_id in ids],
+        'words': words or ['salt'],
+        'recipes': recipes,
+    }
+
+
+def _typo(rng, text):
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def next_request(rng, workload, writes):
+    """(operation, method, path, body) for one request"""
+    if writes and rng.random() < writes:
+        recipe = rng.choice(workload['recipes'])
+        body = {key: recipe[key] for key in ('name', 'ingredients', 'instructions')}
+        return 'update', 'PUT', f"/recipes/{recipe['id']}", body
+    operation = rng.choices([name for name, _ in OPERATIONS], [weight for _, weight in OPERATIONS])[0]
+    if operation == 'get':
+        return operation, 'GET', f"/recipes/{rng.choice(workload['ids'])}", None
+    if operation == 'related':
+        return operation, 'GET', f"/related/{rng.choice(workload['ids'])}?limit=10", None
+    if operation == 'search_ingredients':
+        query = ', '.join(rng.sample(workload['words'], min(2, len(workload['words']))))
+        return operation, 'GET', '/search?' + urlencode({'mode': 'ingredients', 'q': query}), None
+    name = rng.choice(workload['names'])
+    if operation == 'search_fuzzy':
+        return operation, 'GET', '/search?' + urlencode({'mode': 'fuzzy', 'q': _typo(rng, name), 'limit': 20}), None
+    word = rng.choice(name.split())
+    query = word[:rng.randint(1, len(word))]
+    return operation, 'GET', '/search?' + urlencode({'mode': 'name', 'q': query, 'limit': 100}), None
+
+
+async def _send(reader, writer, host, method, path, body):
+    """One request on a kept-alive connection; returns the status"""
+    data = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(data)}\r\n"
+        f"Content-Type: application/json\r\n\r\n".encode('latin-1') + data
+    )
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _connection(host, port, deadline, workload, writes, rng, samples, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            operation, method, path, body = next_request(rng, workload, writes)
+            started = time.perf_counter()
+            status = await _send(reader, writer, host, method, path, body)
+            samples.setdefault(operation, []).append(time.perf_counter() - started)
+            if status >= 400:
+                errors[operation] = errors.get(operation, 0) + 1
+    finally:
+        writer.close()
+
+
+async def _generate(url, connections, duration, workload, writes, seed):
+    address = urlsplit(url)
+    host, port = address.hostname or '127.0.0.1', address.port or 80
+    samples, errors = {}, {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        _connection(host, port, deadline, workload, writes, random.Random(seed * 1000 + i), samples, errors)
+        for i in range(connections)
+    ))
+    return samples, errors
+
+
+def generate(job):
+    """Process entry point: run connections for duration seconds; returns (samples, errors)"""
+    return asyncio.run(_generate(*job))
+
+
+def run(url, connections=32, duration=10.0, processes=1, writes=0.0, seed=0):
+    """Load the server and summarize: requests/sec overall plus per-operation latency"""
+    workload = sample_workload(url, seed)
+    shares = [connections // processes + (i < connections % processes) for i in range(processes)]
+    jobs = [(url, share, duration, workload, writes, seed + i) for i, share in enumerate(shares) if share]
+
+    started = time.perf_counter()
+    if len(jobs) == 1:
+        results = [generate(jobs[0])]
+    else:
+        with Pool(len(jobs)) as pool:
+            results = pool.map(generate, jobs)
+    elapsed = time.perf_counter() - started
+
+    samples, errors = {}, {}
+    for process_samples, process_errors in results:
+        for operation, durations in process_samples.items():
+            samples.setdefault(operation, []).extend(durations)
+        for operation, count in process_errors.items():
+            errors[operation] = errors.get(operation, 0) + count
+    total = sum(len(durations) for durations in samples.values())
+    return {
+        'url': url,
+        'connections': connections,
+        'processes': len(jobs),
+        'duration': round(elapsed, 3),
+        'requests': total,
+        'requests_per_sec': round(total / elapsed, 1),
+        'errors': sum(errors.values()),
+        'overall': percentiles([d for durations in samples.values() for d in durations]) if total else {},
+        'operations': {
+            operation: {**percentiles(durations), 'errors': errors.get(operation, 0)}
+            for operation, durations in sorted(samples.items())
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure requests/sec of a running recipe_server.py")
+    parser.add_argument('url', nargs='?', default='http://127.0.0.1:8765')
+    parser.add_argument('--connections', type=int, default=32, help="concurrent keep-alive connections (default: 32)")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run (default: 10)")
+    parser.add_argument('--processes', type=int, default=1, help="load generator processes (default: 1)")
+    parser.add_argument('--writes', type=float, default=0.0, help="fraction of requests that are edits (default: 0)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="also write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        results = run(args.url, args.connections, args.duration, args.processes, args.writes, args.seed)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{results['requests']} requests in {results['duration']:.2f}s over {args.connections} connections: "
+          f"{results['requests_per_sec']:,.0f} requests/sec, {results['errors']} errors")
+    for operation, summary in results['operations'].items():
+        print(f"  {operation:<20} {summary['count']:>8}  p50 {summary['p50']:>8.2f} ms  "
+              f"p90 {summary['p90']:>8.2f} ms  p99 {summary['p99']:>8.2f} ms")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Compact in-memory recipe records.
+
+A loaded catalogue is mostly repeated ingredient lines and instruction text
+nobody is looking at. RecipePool keeps one copy of each distinct
+ingredient string and packs every recipe's instructions into one shared
+UTF-8 buffer. The Recipe records are __slots__ objects that point into the
+pool and decode their instructions only when asked.
+
+Records read like the dicts they replace (recipe['name'], dict(recipe),
+'instructions' in recipe), so indexes and storage code work with either.
+Optional detail fields (cook_time, tags, ...) ride along in a small dict.
+"""
+
+# Ends each instruction line inside the text buffer. Lines holding it or
+# _ESCAPE (rare outside odd imports) are stored escaped, so any list of
+# strings round-trips, [''] included.
+_SEPARATOR = '\x1e'
+_ESCAPE = '\x1b'
+_ESCAPES = str.maketrans({_ESCAPE: _ESCAPE + '0', _SEPARATOR: _ESCAPE + '1'})
+
+
+def _unescape(line):
+    # An escaped line is plain characters, ESC 0 and ESC 1, so ESC 1 is never
+    # the tail of another escape
+    return line.replace(_ESCAPE + '1', _SEPARATOR).replace(_ESCAPE + '0', _ESCAPE)
+
+
+class Recipe:
+    __slots__ = ('id', 'name', 'ingredients', 'details', '_offset', '_length', '_pool')
+
+    _KEYS = ('id', 'name', 'ingredients', 'instructions')
+
+    def __init__(self, pool, recipe_id, name, ingredients, offset=-1, length=0, details=None):
+        self._pool = pool
+        self.id = recipe_id
+        self.name = name
+        self.ingredients = ingredients  # tuple of pooled strings
+        self.details = details  # extra fields beyond _KEYS, or None
+        self._offset = offset  # -1: instructions are not held in memory
+        self._length = length
+
+    @property
+    def instructions(self):
+        if self._offset < 0:
+            raise KeyError('instructions')
+        return self._pool.text(self._offset, self._length)
+
+    def keys(self):
+        keys = self._KEYS if self._offset >= 0 else self._KEYS[:3]
+        return keys + tuple(self.details) if self.details else keys
+
+    def __getitem__(self, key):
+        if key in self._KEYS:
+            return getattr(self, key)
+        if self.details and key in self.details:
+            return self.details[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def to_dict(self):
+        """A plain dict with list fields, as stored on disk"""
+        recipe = {'id': self.id, 'name': self.name, 'ingredients': list(self.ingredients)}
+        if self._offset >= 0:
+            recipe['instructions'] = self.instructions
+        if self.details:
+            recipe.update(self.details)
+        return recipe
+
+    def __repr__(self):
+        return f"Recipe(id={self.id!r}, name={self.name!r})"
+
+
+class RecipePool:
+    """Shared storage behind Recipe records: interned ingredients and a text buffer.
+
+    Replacing or dropping a record leaves its instruction bytes behind as
+    garbage; vacuum() rewrites the buffer from the live records once the
+    garbage outweighs them.
+    """
+
+    def __init__(self):
+        self._strings = {}  # ingredient line -> its one shared copy
+        self._text = bytearray()
+        self.garbage = 0
+
+    def intern(self, text):
+        return self._strings.setdefault(text, text)
+
+    def _append_text(self, lines):
+        text = _SEPARATOR.join(lines) + _SEPARATOR if lines else ''
+        if _ESCAPE in text or text.count(_SEPARATOR) != len(lines):
+            text = ''.join(line.translate(_ESCAPES) + _SEPARATOR for line in lines)
+        data = text.encode('utf-8')
+        offset = len(self._text)
+        self._text += data
+        return offset, len(data)
+
+    def text(self, offset, length):
+        if not length:
+            return []
+        text = self._text[offset:offset + length].decode('utf-8')
+        lines = text.split(_SEPARATOR)
+        del lines[-1]  # Empty: every line ends with a separator
+        if _ESCAPE in text:
+            lines = [_unescape(line) for line in lines]
+        return lines
+
+    def make(self, recipe):
+        """Build a Recipe from a recipe dict (instructions and details are optional)"""
+        ingredients = tuple(self.intern(line) for line in recipe['ingredients'])
+        details = None
+        if len(recipe) > 3 + ('instructions' in recipe):
+            details = {key: value for key, value in recipe.items() if key not in Recipe._KEYS} or None
+        if 'instructions' not in recipe:
+            return Recipe(self, recipe['id'], recipe['name'], ingredients, details=details)
+        offset, length = self._append_text(recipe['instructions'])
+        return Recipe(self, recipe['id'], recipe['name'], ingredients, offset, length, details)
+
+    def release(self, recipe):
+        """Account for a record that is no longer live"""
+        if isinstance(recipe, Recipe) and recipe._offset >= 0:
+            self.garbage += recipe._length
+
+    def needs_vacuum(self):
+        return self.garbage > 1 << 20 and self.garbage * 2 > len(self._text)
+
+    def vacuum(self, live):
+        """Repack the text buffer with just the live records' instructions"""
+        text = bytearray()
+        for recipe in live:
+            if isinstance(recipe, Recipe) and recipe._offset >= 0:
+                data = self._text[recipe._offset:recipe._offset + recipe._length]
+                recipe._offset = len(text)
+                text += data
+        self._text = text
+        self.garbage = 0
+
+    def stats(self):
+        return {
+            'distinct_ingredients': len(self._strings),
+            'text_bytes': len(self._text),
+            'garbage_bytes': self.garbage,
+        }
+
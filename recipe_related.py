@@ -0,0 +1,325 @@
+"""Precomputed "more like this" neighbours from ingredient similarity.
+
+Recipes are compared by their sets of ingredient tokens (as produced by
+IngredientIndex), leaving out tokens so common they say nothing about a
+recipe. The batch build gives every recipe a MinHash signature, pairs up
+recipes whose signatures agree on a whole band (locality-sensitive
+hashing) and keeps each recipe's K best candidates by estimated Jaccard
+similarity. NumPy runs the batch vectorized when it is installed; without
+it the same steps run in pure Python, only slower, and give the same
+lists (ties go to the higher recipe ID either way).
+
+Edits are folded in one recipe at a time: candidates come from the
+ingredient postings of the recipe's rarest tokens, are scored by exact
+Jaccard similarity, and the recipe is offered to each candidate's list.
+
+build() can also be run in three steps, so a GUI can compute off its main
+loop: prepare() snapshots the tokens, compute() touches nothing shared,
+and finish() installs the lists and replays edits made in the meantime.
+"""
+import heapq
+import operator
+import random
+import zlib
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # optional; the pure-Python build gives the same neighbours
+    np = None
+
+PRIME = (1 << 31) - 1  # modulus of the MinHash hash family
+
+
+class RelatedIndex:
+    """Top-K ingredient-similar recipes for every recipe.
+
+    Neighbour lists live in two flat arrays, K slots per recipe, so a
+    lookup is O(K) and 100k recipes cost a few MB. A list can still name a
+    recipe deleted since; lookups skip it.
+    """
+
+    K = 10
+    HASHES = 32
+    BAND_ROWS = 3        # signature rows hashed together per LSH band
+    MAX_BUCKET = 64      # a band shared by more recipes than this carries no signal
+    COMMON_FRACTION = 0.1
+    MAX_CANDIDATES = 2000
+    PAIR_CHUNK = 1 << 20
+    SEED = 1
+
+    def __init__(self, ingredient_index, use_numpy=None):
+        self.ingredient_index = ingredient_index
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self._rows = {}           # recipe ID -> slot row
+        self._ids = array('i')    # K neighbour IDs per row, -1 when unused
+        self._scores = array('f')
+        self._free = []           # rows given up by deleted recipes
+        self._common = frozenset()
+        self.ready = False
+        self._snapshot = None
+        self._built = None
+        self._pending = {}        # recipe ID -> still exists, for edits made while building
+        rng = random.Random(self.SEED)
+        self._a = [rng.randrange(1, PRIME) for _ in range(self.HASHES)]
+        self._b = [rng.randrange(PRIME) for _ in range(self.HASHES)]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _features(self, recipe_id):
+        return self.ingredient_index._tokens_of(recipe_id) - self._common
+
+    @staticmethod
+    def _token_key(token):
+        return zlib.crc32(token.encode('utf-8'))
+
+    def build(self, recipe_ids):
+        """Compute every recipe's neighbours in one batch"""
+        self.prepare(recipe_ids)
+        self.compute()
+        self.finish()
+
+    def prepare(self, recipe_ids):
+        """Snapshot the ingredient tokens of recipe_ids for compute()"""
+        self.ready = False
+        self._pending = {}
+        self._snapshot = [(recipe_id, self.ingredient_index._tokens_of(recipe_id)) for recipe_id in recipe_ids]
+
+    def compute(self):
+        features = self._snapshot
+        counts = Counter(token for _, tokens in features for token in tokens)
+        limit = max(100, self.COMMON_FRACTION * len(features))
+        common = frozenset(token for token, n in counts.items() if n > limit)
+
+        rows = {}
+        ids, token_sets = [], []
+        for recipe_id, tokens in features:
+            rows[recipe_id] = len(rows)
+            tokens = tokens - common
+            if tokens:
+                ids.append(recipe_id)
+                token_sets.append(tokens)
+        self._built = (rows, common, array('i', [-1]) * (len(rows) * self.K), array('f', [0.0]) * (len(rows) * self.K))
+        if ids:
+            build = self._build_numpy if self.use_numpy else self._build_python
+            build(rows, ids, token_sets)
+        self._snapshot = None
+
+    def finish(self):
+        """Install what compute() built, then fold in edits made since prepare()"""
+        self._rows, self._common, self._ids, self._scores = self._built
+        self._built = None
+        self._free = []
+        self.ready = True
+        pending, self._pending = self._pending, {}
+        for recipe_id, exists in pending.items():
+            if exists:
+                self.add(recipe_id)
+            else:
+                self.remove(recipe_id)
+
+    def _build_python(self, rows, ids, token_sets):
+        hashes = {}
+        for tokens in token_sets:
+            for token in tokens:
+                if token not in hashes:
+                    x = self._token_key(token)
+                    hashes[token] = tuple((a * x + b) % PRIME for a, b in zip(self._a, self._b))
+        signatures = [tuple(map(min, *(hashes[token] for token in tokens))) if len(tokens) > 1
+                      else hashes[next(iter(tokens))] for tokens in token_sets]
+
+        candidates = [set() for _ in ids]
+        neighbour_ids, neighbour_scores = self._built[2:]
+        width = self.BAND_ROWS
+        for band in range(0, self.HASHES - width + 1, width):
+            buckets = {}
+            for i, signature in enumerate(signatures):
+                buckets.setdefault(signature[band:band + width], []).append(i)
+            for members in buckets.values():
+                if 1 < len(members) <= self.MAX_BUCKET:
+                    for i in members:
+                        candidates[i].update(members)
+
+        for i, others in enumerate(candidates):
+            others.discard(i)
+            signature = signatures[i]
+            scored = [(sum(map(operator.eq, signature, signatures[j])) / self.HASHES, ids[j]) for j in others]
+            self._write(neighbour_ids, neighbour_scores, rows[ids[i]], heapq.nlargest(self.K, scored))
+
+    def _build_numpy(self, rows, ids, token_sets):
+        # Rows in ascending ID order, so the sorted pairs below are in neighbour ID order too
+        ids, token_sets = zip(*sorted(zip(ids, token_sets), key=operator.itemgetter(0)))
+        vocabulary = {}
+        flat = []
+        starts = []
+        for tokens in token_sets:
+            starts.append(len(flat))
+            flat.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        keys = np.array([self._token_key(token) for token in vocabulary], dtype=np.uint64)
+        a = np.array(self._a, dtype=np.uint64)
+        b = np.array(self._b, dtype=np.uint64)
+        hashes = ((keys[:, None] * a + b) % PRIME).astype(np.uint32)
+
+        # Signatures in chunks of recipes, so the gathered hash rows stay small
+        flat = np.array(flat, dtype=np.int64)
+        starts = np.array(starts + [len(flat)], dtype=np.int64)
+        n = len(ids)
+        signatures = np.empty((n, self.HASHES), dtype=np.uint32)
+        step = 20000
+        for lo in range(0, n, step):
+            hi = min(n, lo + step)
+            gathered = hashes[flat[starts[lo]:starts[hi]]]
+            signatures[lo:hi] = np.minimum.reduceat(gathered, starts[lo:hi] - starts[lo], axis=0)
+
+        # Candidate pairs: rows sharing a band, bucket by bucket. Rows are
+        # sorted on the band's columns and compared whole, so (unlike a hash
+        # of them) no two buckets the pure-Python build keeps apart merge
+        left, right = [], []
+        width = self.BAND_ROWS
+        for band in range(0, self.HASHES - width + 1, width):
+            columns = signatures[:, band:band + width]
+            order = np.lexsort(columns.T[::-1])
+            columns = columns[order]
+            key = np.cumsum(np.r_[True, (columns[1:] != columns[:-1]).any(axis=1)])  # bucket number
+            run_starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+            lengths = np.diff(np.r_[run_starts, n])
+            usable = np.repeat((lengths > 1) & (lengths <= self.MAX_BUCKET), lengths)
+            for distance in range(1, self.MAX_BUCKET):
+                same = (key[distance:] == key[:-distance]) & usable[distance:]
+                if not same.any():
+                    break
+                positions = np.flatnonzero(same)
+                left.append(order[positions])
+                right.append(order[positions + distance])
+        if not left:
+            return
+        left = np.concatenate(left)
+        right = np.concatenate(right)
+        pairs = np.unique(np.concatenate([left * n + right, right * n + left]))
+        left, right = pairs // n, pairs % n
+
+        agree = np.empty(len(pairs), dtype=np.int64)
+        for lo in range(0, len(pairs), self.PAIR_CHUNK):
+            hi = lo + self.PAIR_CHUNK
+            agree[lo:hi] = (signatures[left[lo:hi]] == signatures[right[lo:hi]]).sum(axis=1)
+
+        # Best K per recipe: order by (recipe, -score, -neighbour ID), as
+        # heapq.nlargest orders (score, ID) pairs, and keep each run's head.
+        # The pairs ascend by (recipe, neighbour ID), so once reversed a
+        # stable sort on (recipe, -score) leaves ties by descending ID
+        left, right, agree = left[::-1], right[::-1], agree[::-1]
+        order = np.argsort(left * (self.HASHES + 1) + (self.HASHES - agree), kind='stable')
+        left, right = left[order], right[order]
+        scores = (agree[order] / self.HASHES).astype(np.float32)
+        run_starts = np.flatnonzero(np.r_[True, left[1:] != left[:-1]])
+        rank = np.arange(len(left)) - np.repeat(run_starts, np.diff(np.r_[run_starts, len(left)]))
+        keep = rank < self.K
+        left, right, scores, rank = left[keep], right[keep], scores[keep], rank[keep]
+
+        slots = np.array([rows[recipe_id] for recipe_id in ids], dtype=np.int64)[left] * self.K + rank
+        ids = np.array(ids, dtype=np.int64)
+        _, common, neighbour_ids, neighbour_scores = self._built
+        neighbour_ids = np.frombuffer(neighbour_ids, dtype=np.int32).copy()
+        neighbour_scores = np.frombuffer(neighbour_scores, dtype=np.float32).copy()
+        neighbour_ids[slots] = ids[right]
+        neighbour_scores[slots] = scores
+        self._built = (rows, common, array('i', neighbour_ids.tobytes()), array('f', neighbour_scores.tobytes()))
+
+    def _row(self, recipe_id):
+        row = self._rows.get(recipe_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._ids) // self.K
+                self._ids.extend([-1] * self.K)
+                self._scores.extend([0.0] * self.K)
+            self._rows[recipe_id] = row
+        return row
+
+    def _write(self, neighbour_ids, neighbour_scores, row, scored):
+        base = row * self.K
+        for slot in range(self.K):
+            score, other = scored[slot] if slot < len(scored) else (0.0, -1)
+            neighbour_ids[base + slot] = other
+            neighbour_scores[base + slot] = score
+
+    def _store(self, recipe_id, scored):
+        """Write a recipe's (score, neighbour ID) list, best first"""
+        self._write(self._ids, self._scores, self._row(recipe_id), scored)
+
+    def _entries(self, recipe_id):
+        base = self._rows[recipe_id] * self.K
+        return [
+            (self._scores[slot], self._ids[slot])
+            for slot in range(base, base + self.K) if self._ids[slot] != -1
+        ]
+
+    def _offer(self, recipe_id, other, score):
+        """Put other into recipe_id's list if it ranks among the best K"""
+        if recipe_id not in self._rows:
+            return
+        entries = [entry for entry in self._entries(recipe_id) if entry[1] != other]
+        if len(entries) == self.K and score <= entries[-1][0]:
+            return
+        entries.append((score, other))
+        entries.sort(key=lambda entry: -entry[0])
+        self._store(recipe_id, entries[:self.K])
+
+    def _detach(self, recipe_id):
+        """Drop recipe_id from the lists of its current neighbours"""
+        for _, other in self._entries(recipe_id):
+            if other in self._rows:
+                entries = self._entries(other)
+                kept = [entry for entry in entries if entry[1] != recipe_id]
+                if len(kept) != len(entries):
+                    self._store(other, kept)
+
+    def _candidates(self, recipe_id, tokens):
+        """Recipes sharing the rarest of tokens, up to about MAX_CANDIDATES"""
+        postings = [self.ingredient_index._posting(token) for token in tokens]
+        postings.sort(key=int.bit_count)
+        bitset = 0
+        for posting in postings:
+            merged = bitset | posting
+            if bitset and merged.bit_count() > self.MAX_CANDIDATES:
+                break
+            bitset = merged
+        bitset &= ~(1 << recipe_id)
+        return self.ingredient_index._bits(bitset)
+
+    def add(self, recipe_id):
+        """(Re)compute one recipe's neighbours after it was added or edited"""
+        if not self.ready:
+            self._pending[recipe_id] = True
+            return
+        if recipe_id in self._rows:
+            self._detach(recipe_id)
+        tokens = self._features(recipe_id)
+        scored = []
+        for other in self._candidates(recipe_id, tokens):
+            other_tokens = self._features(other)
+            score = len(tokens & other_tokens) / len(tokens | other_tokens)
+            scored.append((score, other))
+            # Similarity is symmetric, so the neighbour's list may want this recipe too
+            self._offer(other, recipe_id, score)
+        self._store(recipe_id, heapq.nlargest(self.K, scored))
+
+    def remove(self, recipe_id):
+        if not self.ready:
+            self._pending[recipe_id] = False
+            return
+        if recipe_id not in self._rows:
+            return
+        self._detach(recipe_id)
+        self._store(recipe_id, [])
+        self._free.append(self._rows.pop(recipe_id))
+
+    def related(self, recipe_id, limit=None):
+        """IDs of the recipes most similar to recipe_id, best first (none until built)"""
+        if not self.ready or recipe_id not in self._rows:
+            return []
+        related = [other for _, other in self._entries(recipe_id) if other in self._rows]
+        return related[:limit]
@@ -0,0 +1,469 @@
+"""Local catalogue server: one indexed RecipeStore shared over HTTP/JSON.
+
+    python recipe_server.py --port 8765
+    python Index1.py --server=http://127.0.0.1:8765
+    python recipe_loadtest.py http://127.0.0.1:8765 --connections 32
+
+Terminals that each open recipes.json pay the full load and index cost and
+overwrite each other's edits. In server mode one process loads the
+catalogue once and every terminal talks to it instead. The server runs on
+asyncio; searches and fetches run on a small thread pool under the shared
+side of a ReadWriteLock, and edits run one at a time on a single writer
+thread under its exclusive side, so readers never see a half-applied edit.
+
+Every edit bumps the catalogue version and is logged (ID and new name,
+or null for a deletion), so clients can keep a local name list current by
+polling /changes instead of reloading it. Versions count from zero in
+each server run, which is named by a random epoch; a client holding
+another run's epoch, or a version the log does not cover, is told to
+reload.
+
+    GET    /recipes?after=NAME&limit=N   names in name order: {epoch, version, total, recipes: [[id, name]]}
+    GET    /recipes/ID                   the full recipe
+    POST   /recipes                      {name, ingredients, instructions} -> the new recipe
+    PUT    /recipes/ID                   {name, ingredients, instructions, details?} -> the recipe
+    DELETE /recipes/ID                   -> {id, name}
+    GET    /find?name=NAME               the recipe with this name, or 404
+    GET    /search?mode=MODE&q=QUERY&limit=N
+                                         MODE is name, fuzzy, ingredients, cook or text:
+                                         {results: [[id, name]]} (cook adds matched, total)
+    GET    /related/ID?limit=N           {ready, results: [[id, name]]}
+    GET    /changes?since=VERSION&epoch=EPOCH
+                                         {epoch, version, changes: [[version, id, name]]}, or reset
+    GET    /status                       {epoch, version, supports_fulltext, related_ready, related}, cheap
+                                         to poll; related is building, ready or failed (with related_error)
+    GET    /stats                        catalogue and server counters (walks the catalogue)
+
+Errors come back as {"error": message} with a 4xx/5xx status. A limit must
+not be negative.
+"""
+import argparse
+import asyncio
+import contextlib
+import http
+import json
+import re
+import secrets
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from recipe_bulk import normalize_record
+from recipe_storage import open_storage
+from recipe_store import RecipeStore
+
+DEFAULT_PORT = 8765
+MAX_BODY = 1 << 20
+CHANGE_LOG = 10000  # edits kept for /changes; clients further behind reload
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ReadWriteLock:
+    """asyncio lock with a shared (read) side and an exclusive (write) side.
+
+    A waiting writer holds off new readers, so a steady stream of searches
+    cannot starve an edit.
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._condition = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def write(self):
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class CatalogueServer:
+    """Serves one loaded RecipeStore over HTTP/JSON (see the module docstring)"""
+
+    def __init__(self, store, read_workers=4):
+        self.store = store
+        self.lock = ReadWriteLock()
+        self.readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='read')
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='write')
+        self.epoch = secrets.token_hex(8)
+        self.version = 0
+        self.changes = deque(maxlen=CHANGE_LOG)  # (version, recipe ID, name or None if deleted)
+        self.requests = 0
+        self.connections = 0
+        self.started = time.time()
+        self.related_ready = False
+        self.related_error = None  # why the similar-recipe build failed, if it did
+        self.routes = [
+            ('GET', re.compile(r'/recipes'), self.list_recipes, 'read'),
+            ('POST', re.compile(r'/recipes'), self.add_recipe, 'write'),
+            ('GET', re.compile(r'/recipes/(\d+)'), self.get_recipe, 'read'),
+            ('PUT', re.compile(r'/recipes/(\d+)'), self.update_recipe, 'write'),
+            ('DELETE', re.compile(r'/recipes/(\d+)'), self.delete_recipe, 'write'),
+            ('GET', re.compile(r'/find'), self.find_recipe, 'read'),
+            ('GET', re.compile(r'/search'), self.search, 'read'),
+            ('GET', re.compile(r'/related/(\d+)'), self.related, 'read'),
+            ('GET', re.compile(r'/changes'), self.list_changes, 'read'),
+            ('GET', re.compile(r'/status'), self.status, 'read'),
+            ('GET', re.compile(r'/stats'), self.stats, 'read'),
+        ]
+
+    # Handlers run on the executors: (path groups, query dict, JSON body) -> (status, payload)
+
+    def _rows(self, recipe_ids):
+        recipes = self.store.recipes
+        return [[recipe_id, recipes[recipe_id].name] for recipe_id in recipe_ids]
+
+    @staticmethod
+    def _int(query, key, default=None):
+        try:
+            return int(query[key]) if key in query else default
+        except ValueError:
+            raise HTTPError(400, f"'{key}' must be a number")
+
+    @classmethod
+    def _limit(cls, query, default=None):
+        limit = cls._int(query, 'limit', default)
+        if limit is not None and limit < 0:
+            raise HTTPError(400, "'limit' must not be negative")
+        return limit
+
+    @property
+    def related_state(self):
+        if self.related_ready:
+            return 'ready'
+        return 'building' if self.related_error is None else 'failed'
+
+    def _existing(self, recipe_id):
+        recipe_id = int(recipe_id)
+        if recipe_id not in self.store.recipes:
+            raise HTTPError(404, f"No recipe with ID {recipe_id}")
+        return recipe_id
+
+    def list_recipes(self, groups, query, body):
+        sorted_ids = self.store.sorted_ids
+        start = 0
+        if 'after' in query:
+            # Keyset paging: edits between pages cannot shift rows past the cursor
+            after = query['after'].casefold()
+            start = self.store.sorted_row(after)
+            if start < len(sorted_ids) and self.store.recipes[sorted_ids[start]].name.casefold() == after:
+                start += 1
+        limit = self._limit(query, len(sorted_ids))
+        return 200, {
+            'epoch': self.epoch,
+            'version': self.version,
+            'total': len(sorted_ids),
+            'recipes': self._rows(sorted_ids[start:start + limit]),
+        }
+
+    def get_recipe(self, groups, query, body):
+        return 200, self.store.get(self._existing(groups[0]))
+
+    def find_recipe(self, groups, query, body):
+        recipe = self.store.find(query.get('name', ''))
+        if recipe is None:
+            raise HTTPError(404, f"No recipe named '{query.get('name', '')}'")
+        return 200, self.store.get(recipe.id)
+
+    def search(self, groups, query, body):
+        mode = query.get('mode', 'name')
+        text = query.get('q', '')
+        limit = self._limit(query)
+        if mode == 'cook':
+            matches = self.store.can_make(text)[:limit]
+            recipes = self.store.recipes
+            results = [[recipe_id, recipes[recipe_id].name, matched, total] for recipe_id, matched, total in matches]
+            return 200, {'results': results}
+        if mode == 'name':
+            recipe_ids = self.store.search_names(text, limit)
+        elif mode == 'fuzzy':
+            recipe_ids = self.store.search_fuzzy(text, limit or 50)
+        elif mode == 'ingredients':
+            recipe_ids = self.store.search_ingredients(text)
+        elif mode == 'text':
+            recipe_ids = self.store.search_text(text)
+        else:
+            raise HTTPError(400, f"Unknown search mode '{mode}'")
+        return 200, {'results': self._rows(recipe_ids[:limit])}
+
+    def related(self, groups, query, body):
+        recipe_id = self._existing(groups[0])
+        limit = self._limit(query)
+        results = self.store.related(recipe_id, limit) if self.related_ready else []
+        return 200, {'ready': self.related_ready, 'results': self._rows(results)}
+
+    def list_changes(self, groups, query, body):
+        since = self._int(query, 'since', 0)
+        oldest = self.changes[0][0] - 1 if self.changes else self.version
+        if query.get('epoch', self.epoch) != self.epoch or not oldest <= since <= self.version:
+            # Another server run's version (e.g. from before a restart), or
+            # one the log no longer reaches back to
+            return 200, {'epoch': self.epoch, 'version': self.version, 'reset': True}
+        changes = [list(change) for change in self.changes if change[0] > since]
+        return 200, {'epoch': self.epoch, 'version': self.version, 'changes': changes}
+
+    def status(self, groups, query, body):
+        status = {
+            'epoch': self.epoch,
+            'version': self.version,
+            'supports_fulltext': self.store.storage.supports_fulltext,
+            'related_ready': self.related_ready,
+            'related': self.related_state,
+        }
+        if self.related_error is not None:
+            status['related_error'] = self.related_error
+        return 200, status
+
+    def stats(self, groups, query, body):
+        return 200, {
+            **self.store.stats(),
+            'supports_fulltext': self.store.storage.supports_fulltext,
+            'related_ready': self.related_ready,
+            'related': self.related_state,
+            'version': self.version,
+            'requests': self.requests,
+            'connections': self.connections,
+            'uptime_seconds': round(time.time() - self.started, 1),
+        }
+
+    @staticmethod
+    def _recipe_from(body):
+        result = normalize_record(body)
+        if result is None:
+            raise ValueError("Recipe name cannot be empty!")
+        return result[1]
+
+    def _changed(self, recipe_id, name):
+        self.version += 1
+        self.changes.append((self.version, recipe_id, name))
+
+    def add_recipe(self, groups, query, body):
+        recipe = self._recipe_from(body)
+        record = self.store.add(recipe['name'], recipe['ingredients'], recipe['instructions'])
+        self._changed(record.id, record.name)
+        return 201, self.store.get(record.id)
+
+    def update_recipe(self, groups, query, body):
+        recipe_id = self._existing(groups[0])
+        recipe = self._recipe_from(body)
+        details = body.get('details')
+        if details is not None and not isinstance(details, dict):
+            raise ValueError("'details' must be an object")
+        record = self.store.update(recipe_id, recipe['name'], recipe['ingredients'], recipe['instructions'], details)
+        self._changed(recipe_id, record.name)
+        return 200, self.store.get(recipe_id)
+
+    def delete_recipe(self, groups, query, body):
+        recipe = self.store.delete(self._existing(groups[0]))
+        self._changed(recipe.id, None)
+        return 200, {'id': recipe.id, 'name': recipe.name}
+
+    # HTTP plumbing
+
+    def _call(self, handler, groups, query, body):
+        """Run a handler and encode its reply, on an executor thread"""
+        try:
+            status, payload = handler(groups, query, body)
+        except HTTPError as e:
+            status, payload = e.status, {'error': str(e)}
+        except ValueError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            traceback.print_exc()
+            status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+        return status, json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    async def dispatch(self, method, target, data):
+        """(status, encoded JSON) for one request"""
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+        path_found = False
+        for route_method, pattern, handler, kind in self.routes:
+            match = pattern.fullmatch(url.path)
+            if match is None:
+                continue
+            path_found = True
+            if route_method == method:
+                break
+        else:
+            status = 405 if path_found else 404
+            return status, json.dumps({'error': http.HTTPStatus(status).phrase}).encode('utf-8')
+
+        body = None
+        if kind == 'write':
+            try:
+                body = json.loads(data or b'{}')
+            except ValueError:
+                return 400, b'{"error": "The request body is not valid JSON"}'
+            if not isinstance(body, dict):
+                return 400, b'{"error": "The request body must be a JSON object"}'
+
+        loop = asyncio.get_running_loop()
+        if kind == 'write':
+            async with self.lock.write():
+                return await loop.run_in_executor(self.writer, self._call, handler, match.groups(), query, body)
+        async with self.lock.read():
+            return await loop.run_in_executor(self.readers, self._call, handler, match.groups(), query, body)
+
+    async def handle(self, reader, writer):
+        """Serve one keep-alive connection"""
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, b'{"error": "Malformed request line"}', False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY or 'transfer-encoding' in headers:
+                    await self._respond(writer, 400, b'{"error": "Send a body of at most 1 MiB with Content-Length"}', False)
+                    break
+                data = await reader.readexactly(length) if length else b''
+
+                self.requests += 1
+                status, payload = await self.dispatch(method, target, data)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        head = (
+            f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    async def build_related(self):
+        """Build the similar-recipe lists in the background; edits only wait for the ends"""
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.lock.write():
+                related_index = await loop.run_in_executor(self.writer, self.store.prepare_related_index)
+            await loop.run_in_executor(None, related_index.compute)
+            async with self.lock.write():
+                await loop.run_in_executor(self.writer, related_index.finish)
+        except Exception as e:
+            # Everything else keeps working; /status tells clients to stop waiting
+            self.related_error = f"{type(e).__name__}: {e}"
+            print(f"Could not build related recipes: {self.related_error}", file=sys.stderr)
+            return
+        self.related_ready = True
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Serving {len(self.store)} recipes on http://{address[0]}:{address[1]}", file=sys.stderr)
+        if ready is not None:
+            ready(address)
+        related = asyncio.create_task(self.build_related())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            related.cancel()
+
+    def close(self):
+        self.readers.shutdown()
+        self.writer.shutdown()
+        self.store.close()
+
+
+def run_in_thread(store, host='127.0.0.1', port=0, read_workers=4):
+    """Start a server on a daemon thread; returns (server, base URL) once it is listening"""
+    server = CatalogueServer(store, read_workers)
+    listening = threading.Event()
+    address = []
+
+    def ready(sockname):
+        address.extend(sockname[:2])
+        listening.set()
+
+    threading.Thread(target=lambda: asyncio.run(server.serve(host, port, ready)), daemon=True).start()
+    listening.wait()
+    return server, f"http://{address[0]}:{address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the recipe catalogue to several terminals over HTTP/JSON")
+    parser.add_argument('--catalogue', default='recipes.json', help="JSON catalogue (default: recipes.json)")
+    parser.add_argument('--db', default='recipes.db', help="SQLite catalogue, used if it exists (default: recipes.db)")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--read-workers', type=int, default=4, help="threads serving reads (default: 4)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    store = RecipeStore(open_storage(args.catalogue, args.db)).load()
+    store.build_indexes()
+    print(f"Loaded and indexed {len(store)} recipes in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+    server = CatalogueServer(store, args.read_workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
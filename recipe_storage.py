@@ -0,0 +1,658 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import zlib
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array without reading it whole"""
+    decoder = json.JSONDecoder()
+    buf, pos = '', 0
+
+    def peek():
+        # Skip whitespace, refilling the buffer; '' means end of file
+        nonlocal buf, pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            buf, pos = f.read(chunk_size), 0
+            if not buf:
+                return ''
+
+    if peek() != '[':
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    if peek() == ']':
+        return
+    while True:
+        peek()
+        while True:
+            try:
+                item, pos = decoder.raw_decode(buf, pos)
+                break
+            except json.JSONDecodeError:
+                # The element straddles the chunk boundary; read more
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buf, pos = buf[pos:] + chunk, 0
+        yield item
+        c = peek()
+        if c == ']':
+            return
+        if c != ',':
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {c!r}")
+        pos += 1
+
+
+class JournalStorage:
+    """Snapshot plus append-only journal storage for recipes.json.
+
+    Every mutation is appended to the journal as one checksummed line, so a
+    save costs the same regardless of catalogue size. The journal is
+    periodically folded into a fresh snapshot, written to a temp file and
+    atomically renamed over the old one. Compaction first sets the journal
+    aside as .journal.old, so it can run on a background thread while edits
+    go on into a fresh journal; loading replays .journal.old before the
+    journal, which is harmless once the snapshot already covers it.
+
+    Journal line format: "<crc32 hex> <json record>\\n" where the record is
+    {"op": "put", "recipe": {"id": ..., ...}} or {"op": "delete", "id": ...}.
+    Recipes are addressed by their stable integer "id", so renames need no
+    special handling. IDs are never handed out twice: the journal a
+    compaction starts opens with {"op": "next_id", "id": ...}, a high-water
+    mark the snapshot cannot show once the highest IDs have been deleted.
+
+    If a binary catalogue (recipes.rcat, see recipe_binary) built from the
+    current snapshot sits next to it, open_catalogue() maps that instead of
+    parsing the JSON, and compaction rebuilds it.
+    """
+
+    supports_fulltext = False
+
+    def __init__(self, path='recipes.json', compact_every=1000, fsync=True, binary_path=None):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.old_journal_path = self.journal_path + '.old'
+        self.binary_path = binary_path or os.path.splitext(path)[0] + '.rcat'
+        self.catalogue = None
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.journal_records = 0
+        self.load_progress = 0.0
+        self.next_id = 1
+        self._journal = None
+        self._compactor = None  # thread writing a snapshot in the background
+        self._compaction_error = None
+
+    @staticmethod
+    def _encode(record):
+        payload = json.dumps(record, separators=(',', ':'))
+        return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n".encode('utf-8')
+
+    @staticmethod
+    def _decode(line):
+        """Return the record on a journal line, or None if it is torn or corrupt"""
+        try:
+            text = line.decode('utf-8')
+            checksum, payload = text.rstrip('\n').split(' ', 1)
+            if not text.endswith('\n') or int(checksum, 16) != zlib.crc32(payload.encode('utf-8')):
+                return None
+            return json.loads(payload)
+        except (UnicodeDecodeError, ValueError):
+            return None
+
+    def load(self):
+        """Return the recipe list: the snapshot with the journal tail replayed"""
+        return [recipe for batch in self.iter_load() for recipe in batch]
+
+    def iter_load(self, batch_size=1000):
+        """Stream the catalogue in batches, overlaying the journal on the snapshot.
+
+        The journal is bounded by compact_every, so it is read first and its
+        net effect applied to each snapshot record as it streams past.
+        self.load_progress tracks the fraction of the snapshot read so far.
+        """
+        overrides = self._read_journal()
+        self.load_progress = 0.0
+        batch = []
+        if os.path.exists(self.path):
+            total = os.path.getsize(self.path) or 1
+            with open(self.path, 'r') as f:
+                for position, recipe in enumerate(iter_json_array(f), 1):
+                    recipe_id = recipe.get('id')
+                    if recipe_id is None:
+                        # Catalogues saved before IDs existed are numbered by
+                        # file position, so the IDs are the same on every load
+                        recipe_id = position
+                        recipe = {'id': recipe_id, **recipe}
+                    self.next_id = max(self.next_id, recipe_id + 1)
+                    if recipe_id in overrides:
+                        recipe = overrides.pop(recipe_id)
+                        if recipe is None:
+                            continue
+                    batch.append(recipe)
+                    if len(batch) >= batch_size:
+                        self.load_progress = min(f.buffer.tell() / total, 1.0)
+                        yield batch
+                        batch = []
+
+        # Recipes added since the snapshot come last
+        batch.extend(recipe for recipe in overrides.values() if recipe is not None)
+        self.load_progress = 1.0
+        if batch:
+            yield batch
+
+    def _read_journal(self):
+        """Return the journal's net effect: recipe ID -> latest recipe, or None if deleted.
+
+        Also sets next_id past every ID the journal has seen.
+        """
+        overrides = {}
+        self.journal_records = 0
+        self.next_id = 1
+        # An unfinished compaction leaves its journal set aside; it comes first
+        for path in (self.old_journal_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            valid_bytes = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    record = self._decode(line)
+                    if record is None:
+                        # A crash mid-append leaves a torn tail; drop it
+                        break
+                    if record['op'] == 'next_id':
+                        self.next_id = max(self.next_id, record['id'])
+                    else:
+                        self._apply(overrides, record)
+                    valid_bytes += len(line)
+                    self.journal_records += 1
+            if valid_bytes != os.path.getsize(path):
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+        self.next_id = max(self.next_id, max(overrides, default=0) + 1)
+        return overrides
+
+    def open_catalogue(self):
+        """Map the binary catalogue if it was built from the current snapshot.
+
+        Returns (catalogue, journal overrides), or None when there is no
+        usable catalogue and the JSON has to be loaded instead.
+        """
+        if not os.path.exists(self.binary_path):
+            return None
+        from recipe_binary import BinaryCatalogue
+
+        try:
+            catalogue = BinaryCatalogue(self.binary_path)
+        except (OSError, ValueError):
+            return None
+        if os.path.exists(self.path):
+            stat = os.stat(self.path)
+            if catalogue.source_stamp != (stat.st_size, stat.st_mtime_ns):
+                # The JSON was rewritten since; the catalogue is stale
+                catalogue.close()
+                return None
+
+        overrides = self._read_journal()
+        self.next_id = max(catalogue.next_id, self.next_id)
+        self.load_progress = 1.0
+        self.catalogue = catalogue
+        return catalogue, overrides
+
+    def write_binary(self, recipes):
+        """Build the binary catalogue for the current snapshot from recipes"""
+        from recipe_binary import write_catalogue
+
+        stat = os.stat(self.path)
+        tmp_path = self.binary_path + '.tmp'
+        try:
+            write_catalogue(tmp_path, recipes, (stat.st_size, stat.st_mtime_ns), self.next_id)
+            os.replace(tmp_path, self.binary_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _apply(recipes, record):
+        if record['op'] == 'put':
+            recipes[record['recipe']['id']] = record['recipe']
+        elif record['op'] == 'delete':
+            recipes[record['id']] = None
+
+    def _append(self, *records):
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'ab')
+        self._journal.write(b''.join(self._encode(record) for record in records))
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self.journal_records += len(records)
+
+    def allocate_id(self):
+        """Return a fresh recipe ID"""
+        recipe_id = self.next_id
+        self.next_id += 1
+        return recipe_id
+
+    def put(self, recipe):
+        """Record an added or edited recipe"""
+        self._append({'op': 'put', 'recipe': recipe})
+
+    def put_many(self, recipes):
+        """Record a batch of recipes with a single write and fsync"""
+        records = [{'op': 'put', 'recipe': recipe} for recipe in recipes]
+        if records:
+            self._append(*records)
+
+    def delete(self, recipe_id):
+        """Record the deletion of a recipe"""
+        self._append({'op': 'delete', 'id': recipe_id})
+
+    @property
+    def compacting(self):
+        """True while a background compaction is still writing"""
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def needs_compaction(self):
+        return self.journal_records >= self.compact_every and not self.compacting
+
+    def compact(self, recipes, background=False):
+        """Write recipes as the new snapshot (and binary catalogue) and retire the journal.
+
+        recipes must be re-iterable and must not change afterwards. In the
+        background this returns once the journal is set aside, and the
+        writing happens on a thread of its own; wait() joins it.
+        """
+        self._join()
+        self._compaction_error = None  # whatever a failed run left is retried now
+        self._set_journal_aside()
+        if not background:
+            self._write_snapshot(recipes)
+            return
+        self._compactor = threading.Thread(
+            target=self._compact_in_background, args=(recipes,), name='compaction'
+        )
+        self._compactor.start()
+
+    def wait(self):
+        """Wait for a background compaction; raises the error it failed with, if any"""
+        self._join()
+        error, self._compaction_error = self._compaction_error, None
+        if error is not None:
+            raise error
+
+    def _join(self):
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def _set_journal_aside(self):
+        """Move the journal to .journal.old so edits go on in a fresh one"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.old_journal_path):
+                # A failed or interrupted compaction still owes these records
+                # a snapshot; keep both (replaying one twice is harmless)
+                with open(self.journal_path, 'rb') as src, open(self.old_journal_path, 'ab') as dst:
+                    shutil.copyfileobj(src, dst)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.old_journal_path)
+        self.journal_records = 0
+        # The new snapshot may not hold the highest IDs given out; keep the mark
+        self._append({'op': 'next_id', 'id': self.next_id})
+
+    def _compact_in_background(self, recipes):
+        try:
+            self._write_snapshot(recipes)
+        except Exception as e:
+            # .journal.old is kept, so nothing is lost; the next compaction retries
+            self._compaction_error = e
+
+    def _write_snapshot(self, recipes):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            # Same layout as json.dump(list, indent=4), one recipe at a time;
+            # dict() also accepts the store's compact records
+            f.write('[')
+            for i, recipe in enumerate(recipes):
+                body = json.dumps(dict(recipe), indent=4).replace('\n', '\n    ')
+                f.write((',\n    ' if i else '\n    ') + body)
+            f.write('\n]' if f.tell() > 1 else ']')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        # Only drop the journal once the snapshot that covers it is durable
+        if os.path.exists(self.old_journal_path):
+            os.remove(self.old_journal_path)
+
+        if os.path.exists(self.binary_path):
+            try:
+                self.write_binary(recipes)
+            except OSError:
+                # Windows will not replace a mapped file; the old catalogue
+                # no longer matches the snapshot, so it is ignored until rebuilt
+                pass
+
+    def close(self):
+        # A background compaction may still be reading the catalogue
+        self._join()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self.catalogue is not None:
+            self.catalogue.close()
+            self.catalogue = None
+
+    def fetch(self, recipe):
+        """Return the full recipe; JSON-backed recipes are already complete"""
+        return recipe
+
+
+class SQLiteStorage:
+    """SQLite catalogue in WAL mode with FTS5 name and full-text search.
+
+    Recipes are rows keyed by their stable ID, with ingredients and
+    instructions in child tables. load() returns lightweight records holding
+    only the ID, name and ingredient lines (needed by the ingredient index)
+    plus any extra fields, kept as JSON in recipes.details; instructions
+    stay on disk until fetch() is called for the details pane. The meta
+    table keeps next_id, so IDs of deleted recipes are never given out again.
+    """
+
+    supports_fulltext = True
+
+    # Columns/child tables of their own; any other field goes in recipes.details
+    FIELDS = ('id', 'name', 'ingredients', 'instructions')
+    NAMES_FOLDED = 1  # user_version from which recipe_names_fts holds casefolded names
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS recipes (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            name_key TEXT NOT NULL UNIQUE,
+            details TEXT
+        );
+        CREATE TABLE IF NOT EXISTS ingredients (
+            recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (recipe_id, position)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS instructions (
+            recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (recipe_id, position)
+        ) WITHOUT ROWID;
+        CREATE VIRTUAL TABLE IF NOT EXISTS recipe_text_fts USING fts5(name, instructions);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value) WITHOUT ROWID;
+    """
+
+    def __init__(self, path='recipes.db'):
+        self.path = path
+        # The GUI streams the initial load on a worker thread while the main
+        # thread may fetch details; SQLite's serialized mode makes that safe
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(recipes)")}
+        if 'details' not in columns:
+            # Databases migrated before recipes carried extra fields
+            self.conn.execute("ALTER TABLE recipes ADD COLUMN details TEXT")
+        try:
+            # The trigram tokenizer (SQLite >= 3.34) answers substring queries
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_names_fts USING fts5(name, tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS recipe_names_fts USING fts5(name)")
+        (version,) = self.conn.execute("PRAGMA user_version").fetchone()
+        if version < self.NAMES_FOLDED:
+            # The name FTS used to hold names as typed, and FTS5 case folding
+            # differs from str.casefold() (e.g. "ß"); reindex the folded keys
+            self.conn.execute("DELETE FROM recipe_names_fts")
+            self.conn.execute("INSERT INTO recipe_names_fts (rowid, name) SELECT id, name_key FROM recipes")
+            self.conn.execute(f"PRAGMA user_version = {self.NAMES_FOLDED}")
+        self.conn.commit()
+        (max_id,) = self.conn.execute("SELECT MAX(id) FROM recipes").fetchone()
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        self.next_id = max((max_id or 0) + 1, row[0] if row else 1)
+        (sql,) = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'recipe_names_fts'"
+        ).fetchone()
+        self.trigram = 'trigram' in sql
+
+    def load(self):
+        return [recipe for batch in self.iter_load() for recipe in batch]
+
+    def iter_load(self, batch_size=1000):
+        """Stream name/ingredient records in batches, in insertion order"""
+        (total,) = self.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()
+        self.load_progress = 0.0
+        loaded = 0
+        batch = []
+        current_id = None
+        rows = self.conn.execute(
+            "SELECT r.id, r.name, r.details, i.text FROM recipes r "
+            "LEFT JOIN ingredients i ON i.recipe_id = r.id ORDER BY r.id, i.position"
+        )
+        for recipe_id, name, details, ingredient in rows:
+            if recipe_id != current_id:
+                current_id = recipe_id
+                if len(batch) >= batch_size:
+                    loaded += len(batch)
+                    self.load_progress = loaded / total
+                    yield batch
+                    batch = []
+                batch.append({'id': recipe_id, 'name': name, 'ingredients': []})
+                if details:
+                    batch[-1].update(json.loads(details))
+            if ingredient is not None:
+                batch[-1]['ingredients'].append(ingredient)
+        self.load_progress = 1.0
+        if batch:
+            yield batch
+
+    def open_catalogue(self):
+        """SQLite is indexed on disk already; there is no binary catalogue"""
+        return None
+
+    def fetch(self, recipe):
+        """Return the full recipe, reading instructions from disk if needed"""
+        if 'instructions' in recipe:
+            return recipe
+        recipe_id = recipe['id']
+        row = self.conn.execute("SELECT name, details FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+        if row is None:
+            return recipe
+        full = {
+            'id': recipe_id,
+            'name': row[0],
+            'ingredients': [t for (t,) in self.conn.execute(
+                "SELECT text FROM ingredients WHERE recipe_id = ? ORDER BY position", (recipe_id,))],
+            'instructions': [t for (t,) in self.conn.execute(
+                "SELECT text FROM instructions WHERE recipe_id = ? ORDER BY position", (recipe_id,))],
+        }
+        if row[1]:
+            full.update(json.loads(row[1]))
+        return full
+
+    def _write(self, recipe):
+        recipe_id = recipe['id']
+        details = {key: recipe[key] for key in recipe.keys() if key not in self.FIELDS}
+        self._delete_children(recipe_id)
+        self.conn.execute(
+            "INSERT INTO recipes (id, name, name_key, details) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET name = excluded.name, name_key = excluded.name_key, "
+            "details = excluded.details",
+            (recipe_id, recipe['name'], recipe['name'].casefold(), json.dumps(details) if details else None)
+        )
+
+        self.conn.executemany(
+            "INSERT INTO ingredients (recipe_id, position, text) VALUES (?, ?, ?)",
+            [(recipe_id, i, text) for i, text in enumerate(recipe['ingredients'])]
+        )
+        self.conn.executemany(
+            "INSERT INTO instructions (recipe_id, position, text) VALUES (?, ?, ?)",
+            [(recipe_id, i, text) for i, text in enumerate(recipe['instructions'])]
+        )
+        self.conn.execute(
+            "INSERT INTO recipe_names_fts (rowid, name) VALUES (?, ?)", (recipe_id, recipe['name'].casefold())
+        )
+        self.conn.execute(
+            "INSERT INTO recipe_text_fts (rowid, name, instructions) VALUES (?, ?, ?)",
+            (recipe_id, recipe['name'], "\n".join(recipe['instructions']))
+        )
+
+    def _write_next_id(self):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('next_id', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)", (self.next_id,)
+        )
+
+    def _delete_children(self, recipe_id):
+        self.conn.execute("DELETE FROM ingredients WHERE recipe_id = ?", (recipe_id,))
+        self.conn.execute("DELETE FROM instructions WHERE recipe_id = ?", (recipe_id,))
+        self.conn.execute("DELETE FROM recipe_names_fts WHERE rowid = ?", (recipe_id,))
+        self.conn.execute("DELETE FROM recipe_text_fts WHERE rowid = ?", (recipe_id,))
+
+    def allocate_id(self):
+        recipe_id = self.next_id
+        self.next_id += 1
+        return recipe_id
+
+    def put(self, recipe):
+        with self.conn:
+            self._write(recipe)
+            self._write_next_id()
+
+    def put_many(self, recipes):
+        """Insert or replace many recipes in a single transaction"""
+        with self.conn:
+            for recipe in recipes:
+                self._write(recipe)
+            self._write_next_id()
+
+    def delete(self, recipe_id):
+        with self.conn:
+            self._delete_children(recipe_id)
+            self.conn.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+            self._write_next_id()
+
+    compacting = False
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self, recipes=None, background=False):
+        """Rows are always current; just fold the WAL back into the database"""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def wait(self):
+        pass
+
+    @staticmethod
+    def _phrase(query):
+        return '"' + query.replace('"', '""') + '"'
+
+    def search_names(self, query):
+        """Return casefolded names containing query"""
+        query = query.casefold()
+        if self.trigram and len(query) >= 3:
+            # The FTS rows are casefolded names, like query
+            rows = self.conn.execute(
+                "SELECT name FROM recipe_names_fts WHERE recipe_names_fts MATCH ?", (self._phrase(query),)
+            )
+            return {key for (key,) in rows}
+        # Trigram MATCH needs three characters; short queries are word prefixes
+        rows = self.conn.execute(
+            "SELECT name_key FROM recipes WHERE name_key LIKE ? ESCAPE '\\' OR name_key LIKE ? ESCAPE '\\'",
+            (self._like(query) + '%', '% ' + self._like(query) + '%')
+        )
+        return {key for (key,) in rows}
+
+    @staticmethod
+    def _like(text):
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    def search_text(self, query, limit=200):
+        """Full-text search over names and instructions; returns recipe IDs, best first"""
+        terms = ' '.join(self._phrase(term) for term in query.split())
+        if not terms:
+            return []
+        rows = self.conn.execute(
+            "SELECT rowid FROM recipe_text_fts WHERE recipe_text_fts MATCH ? ORDER BY rank LIMIT ?",
+            (terms, limit)
+        )
+        return [recipe_id for (recipe_id,) in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+class FTSNameIndex:
+    """SearchIndex-compatible name search served by SQLiteStorage's FTS table.
+
+    The storage keeps the FTS rows current on every put/delete, so the
+    maintenance hooks are no-ops.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def build(self, names):
+        pass
+
+    def add(self, name):
+        pass
+
+    def remove(self, name):
+        pass
+
+    def search(self, query):
+        return self.storage.search_names(query)
+
+
+def open_storage(json_path='recipes.json', db_path='recipes.db'):
+    """Use the SQLite catalogue once it has been migrated, else recipes.json"""
+    if os.path.exists(db_path):
+        return SQLiteStorage(db_path)
+    return JournalStorage(json_path)
+
+
+def migrate_json_to_sqlite(json_path='recipes.json', db_path='recipes.db'):
+    """One-shot copy of a recipes.json catalogue (and its journal) into SQLite"""
+    source = JournalStorage(json_path)
+    recipes = source.load()
+    storage = SQLiteStorage(db_path)
+    try:
+        # Deleted JSON recipes keep their IDs out of circulation here too
+        storage.next_id = max(storage.next_id, source.next_id)
+        storage.put_many(recipes)
+    finally:
+        storage.close()
+    return len(recipes)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) not in (1, 3):
+        sys.exit("usage: python recipe_storage.py [recipes.json recipes.db]")
+    count = migrate_json_to_sqlite(*sys.argv[1:])
+    print(f"Migrated {count} recipes")
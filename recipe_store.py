@@ -0,0 +1,1304 @@
+import bisect
+import heapq
+import re
+import sys
+from array import array
+from collections import deque
+from collections.abc import MutableMapping
+from itertools import repeat
+
+from recipe_model import Recipe, RecipePool
+from recipe_storage import FTSNameIndex, open_storage
+from recipe_trace import traced
+
+
+class TreeNode:
+    __slots__ = ('key', 'recipe', 'left', 'right', 'height')
+
+    def __init__(self, key, recipe):
+        self.key = key
+        self.recipe = recipe
+        self.left = None
+        self.right = None
+        self.height = 1
+
+
+class AVLTree:
+    """Self-balancing recipe index keyed on the casefolded recipe name.
+
+    All operations are iterative, so large (or pre-sorted) catalogues neither
+    degrade into a linked list nor hit Python's recursion limit.
+    """
+
+    def __init__(self):
+        self.root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, name):
+        return self.search(name) is not None
+
+    def __iter__(self):
+        """Yield recipes in name order"""
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.recipe
+            node = node.right
+
+    @staticmethod
+    def _key(name):
+        return name.casefold()
+
+    @staticmethod
+    def _height(node):
+        return node.height if node is not None else 0
+
+    def _update(self, node):
+        node.height = 1 + max(self._height(node.left), self._height(node.right))
+
+    def _rotate_left(self, node):
+        pivot = node.right
+        node.right = pivot.left
+        pivot.left = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rotate_right(self, node):
+        pivot = node.left
+        node.left = pivot.right
+        pivot.right = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _balance(self, node):
+        self._update(node)
+        balance = self._height(node.left) - self._height(node.right)
+        if balance > 1:
+            if self._height(node.left.left) < self._height(node.left.right):
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if self._height(node.right.right) < self._height(node.right.left):
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    def _rebalance_path(self, path):
+        """Rebalance every node on a root-to-leaf path, bottom up"""
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            balanced = self._balance(node)
+            if i == 0:
+                self.root = balanced
+            elif path[i - 1].left is node:
+                path[i - 1].left = balanced
+            else:
+                path[i - 1].right = balanced
+
+    def insert(self, recipe):
+        """Insert a recipe; an existing recipe with the same name is replaced"""
+        key = self._key(recipe['name'])
+        path = []
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                node.recipe = recipe
+                return False
+            path.append(node)
+            node = node.left if key < node.key else node.right
+
+        new_node = TreeNode(key, recipe)
+        if not path:
+            self.root = new_node
+        elif key < path[-1].key:
+            path[-1].left = new_node
+        else:
+            path[-1].right = new_node
+        self._size += 1
+        self._rebalance_path(path)
+        return True
+
+    def search(self, name):
+        """Return the recipe with the given name (case-insensitive) or None"""
+        key = self._key(name)
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                return node.recipe
+            node = node.left if key < node.key else node.right
+        return None
+
+    def delete(self, name):
+        """Remove the recipe with the given name; return it, or None if absent"""
+        key = self._key(name)
+        path = []
+        node = self.root
+        while node is not None and key != node.key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return None
+
+        removed = node.recipe
+        if node.left is not None and node.right is not None:
+            # Replace with the in-order successor, then unlink the successor
+            path.append(node)
+            successor = node.right
+            while successor.left is not None:
+                path.append(successor)
+                successor = successor.left
+            node.key, node.recipe = successor.key, successor.recipe
+            node = successor
+
+        child = node.left if node.left is not None else node.right
+        if not path:
+            self.root = child
+        elif path[-1].left is node:
+            path[-1].left = child
+        else:
+            path[-1].right = child
+        self._size -= 1
+        self._rebalance_path(path)
+        return removed
+
+    def update(self, old_name, recipe):
+        """Replace the recipe stored under old_name, re-keying it if renamed"""
+        if self._key(old_name) == self._key(recipe['name']):
+            key = self._key(old_name)
+            node = self.root
+            while node is not None:
+                if key == node.key:
+                    node.recipe = recipe
+                    return True
+                node = node.left if key < node.key else node.right
+        self.delete(old_name)
+        return self.insert(recipe)
+
+
+class SearchIndex:
+    """Search-as-you-type index over casefolded recipe names.
+
+    Queries shorter than GRAM_SIZE are matched against word prefixes with a
+    bisect over a sorted (word, key) array; longer queries are substring
+    matches answered by intersecting trigram postings. When a query only
+    grows, the previous result set is filtered instead of hitting the index.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self._words = []     # sorted (word, key) pairs for prefix lookups
+        self._grams = {}     # trigram -> set of keys
+        self._last = None    # (query, results) of the previous search
+
+    @staticmethod
+    def _key(name):
+        return name.casefold()
+
+    def _grams_of(self, text):
+        n = self.GRAM_SIZE
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def build(self, names):
+        """Bulk-load the index in one pass (one sort instead of n insorts)"""
+        for name in names:
+            key = self._key(name)
+            self._words.extend((word, key) for word in set(key.split()))
+            for gram in self._grams_of(key):
+                self._grams.setdefault(gram, set()).add(key)
+        self._words.sort()
+        self._last = None
+
+    def add(self, name):
+        key = self._key(name)
+        for word in set(key.split()):
+            bisect.insort(self._words, (word, key))
+        for gram in self._grams_of(key):
+            self._grams.setdefault(gram, set()).add(key)
+        self._last = None
+
+    def remove(self, name):
+        key = self._key(name)
+        for word in set(key.split()):
+            i = bisect.bisect_left(self._words, (word, key))
+            if i < len(self._words) and self._words[i] == (word, key):
+                del self._words[i]
+        for gram in self._grams_of(key):
+            postings = self._grams.get(gram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._grams[gram]
+        self._last = None
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        i = bisect.bisect_left(self._words, (prefix,))
+        while i < len(self._words) and self._words[i][0].startswith(prefix):
+            matches.add(self._words[i][1])
+            i += 1
+        return matches
+
+    def _substring_matches(self, query):
+        grams = sorted(self._grams_of(query), key=lambda g: len(self._grams.get(g, ())))
+        if not grams or grams[0] not in self._grams:
+            return set()
+        candidates = set(self._grams[grams[0]])
+        for gram in grams[1:]:
+            candidates &= self._grams[gram]
+            if not candidates:
+                break
+        return {key for key in candidates if query in key}
+
+    def search(self, query):
+        """Return the set of casefolded names matching query"""
+        query = self._key(query)
+        if len(query) < self.GRAM_SIZE:
+            results = self._prefix_matches(query)
+        else:
+            # One read and one write of the pair, so concurrent searches
+            # (server mode) never see one query's results under another's
+            last = self._last
+            if last is not None and len(last[0]) >= self.GRAM_SIZE and last[0] in query:
+                # The query only grew: refine the previous keystroke's results
+                results = {key for key in last[1] if query in key}
+            else:
+                results = self._substring_matches(query)
+        self._last = (query, results)
+        return results
+
+
+def _bitset(ids):
+    """A Python int with bit i set for every recipe ID i in a collection of IDs"""
+    top = max(ids, default=-1)
+    if top < 0:
+        return 0
+    if len(ids) * 32 < top:
+        bits = bytearray(top // 8 + 1)
+        for recipe_id in ids:
+            bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+        return int.from_bytes(bits, 'little')
+    # Dense postings: set one digit per ID in C and parse the digits as base 2
+    digits = bytearray(b'0') * (top + 1)
+    deque(map(digits.__setitem__, ids, repeat(ord('1'))), 0)
+    digits.reverse()
+    return int(digits, 2)
+
+
+class IngredientIndex:
+    """Inverted index from normalized ingredient tokens to recipe IDs.
+
+    Every token's postings are a sorted array of recipe IDs, 4 bytes each.
+    A query turns the postings it touches into Python int bitsets, so
+    AND/OR/NOT are single big-int operations rather than scans over
+    ingredient strings, without keeping a dense bitset per token.
+    """
+
+    STOPWORDS = frozenset("""
+        a an and or of to the for with into in on as at by taste optional
+        cup cups tbsp tsp tablespoon tablespoons teaspoon teaspoons
+        g kg mg ml l oz lb lbs pound pounds gram grams pinch dash
+        clove cloves slice slices piece pieces can cans large small medium
+        chopped minced sliced diced grated crushed fresh finely roughly
+    """.split())
+
+    def __init__(self):
+        self._postings = {}  # token -> sorted array('I') of recipe IDs
+        self._tokens = {}    # recipe ID -> frozenset of tokens
+        self._all = None     # bitset of every indexed recipe, rebuilt after edits
+
+    @classmethod
+    def normalize(cls, token):
+        """Reduce a word to its singular, lowercase form"""
+        token = token.casefold()
+        if token.endswith('ies') and len(token) > 4:
+            return token[:-3] + 'y'
+        if token.endswith('oes') and len(token) > 4:
+            return token[:-2]
+        if token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+            return token[:-1]
+        return token
+
+    @classmethod
+    def tokenize(cls, text):
+        words = re.findall(r"[^\W\d_]+", text.casefold())
+        return {cls.normalize(w) for w in words if w not in cls.STOPWORDS and len(w) > 1}
+
+    def _posting(self, token):
+        return _bitset(self._postings.get(token, ()))
+
+    def _tokens_of(self, recipe_id):
+        return self._tokens[recipe_id]
+
+    def _universe(self):
+        """Bitset of every indexed recipe"""
+        if self._all is None:
+            self._all = _bitset(self._tokens)
+        return self._all
+
+    def vocabulary(self):
+        """Every token with postings"""
+        return self._postings.keys()
+
+    def _bits(self, bitset):
+        """Yield the recipe IDs set in a bitset"""
+        digits = bin(bitset)[:1:-1]
+        i = digits.find('1')
+        while i != -1:
+            yield i
+            i = digits.find('1', i + 1)
+
+    def build(self, recipes):
+        for recipe in recipes:
+            self.add(recipe)
+
+    def add(self, recipe):
+        """Index a recipe, replacing any previous entry with the same ID"""
+        recipe_id = recipe['id']
+        self.remove(recipe_id)
+        # Interned, so every recipe's token set shares one string per token
+        tokens = frozenset(sys.intern(t) for line in recipe['ingredients'] for t in self.tokenize(line))
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                self._postings[token] = array('I', (recipe_id,))
+            elif postings[-1] < recipe_id:
+                postings.append(recipe_id)
+            else:
+                postings.insert(bisect.bisect_left(postings, recipe_id), recipe_id)
+        self._tokens[recipe_id] = tokens
+        self._all = None
+
+    def remove(self, recipe_id):
+        tokens = self._tokens.pop(recipe_id, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            postings = self._postings[token]
+            if len(postings) == 1:
+                del self._postings[token]
+            else:
+                del postings[bisect.bisect_left(postings, recipe_id)]
+        self._all = None
+
+    def _term(self, term):
+        """Bitset of recipes containing every token of a (multi-word) term"""
+        tokens = self.tokenize(term)
+        if not tokens:
+            return 0
+        bitset = -1
+        for token in tokens:
+            bitset &= self._posting(token)
+            if not bitset:
+                break
+        return bitset
+
+    def query(self, text):
+        """Boolean ingredient query, e.g. "chicken, rice OR noodles, NOT peanut".
+
+        Comma-separated clauses are ANDed; a clause may OR several terms and
+        a clause starting with NOT (or "-") excludes recipes.
+        """
+        include = None
+        exclude = 0
+        for clause in (c.strip() for c in text.split(',')):
+            if not clause:
+                continue
+            negate = False
+            if clause.startswith('-'):
+                negate, clause = True, clause[1:]
+            elif clause.casefold().startswith('not '):
+                negate, clause = True, clause[4:]
+            bitset = 0
+            for term in re.split(r'\s+or\s+', clause, flags=re.IGNORECASE):
+                bitset |= self._term(term)
+            if negate:
+                exclude |= bitset
+            else:
+                include = bitset if include is None else include & bitset
+        if include is None:
+            include = self._universe()
+        return list(self._bits(include & ~exclude))
+
+    def can_make(self, pantry):
+        """Rank recipes by how much of their ingredient list the pantry covers.
+
+        Returns (recipe ID, matched, total) tuples, best coverage first.
+        """
+        have = set()
+        for term in pantry.split(','):
+            have |= self.tokenize(term)
+        candidates = 0
+        for token in have:
+            candidates |= self._posting(token)
+        ranked = []
+        for recipe_id in self._bits(candidates):
+            tokens = self._tokens_of(recipe_id)
+            ranked.append((recipe_id, len(tokens & have), len(tokens)))
+        ranked.sort(key=lambda r: (-r[1] / r[2], r[2] - r[1], r[0]))
+        return ranked
+
+
+
+class FuzzyIndex:
+    """Typo-tolerant, ranked search over name words and ingredient tokens.
+
+    Every vocabulary term goes into a SymSpell deletion dictionary: each
+    string reachable by deleting up to MAX_DISTANCE characters from the
+    term's first PREFIX_LENGTH characters maps back to the term, so a
+    misspelt query word finds its candidate terms with a few dict lookups
+    and a bounded edit-distance check. Terms are never dropped; one whose
+    postings have emptied simply matches nothing.
+
+    Each query word splits the recipes into disjoint match levels (name word
+    or ingredient token, by edit distance) held as bitsets, and a best-first
+    walk over combinations of levels yields the top results without scoring
+    every recipe.
+    """
+
+    MAX_DISTANCE = 2
+    PREFIX_LENGTH = 7
+    MAX_WORDS = 6
+    MAX_COMPLETIONS = 64
+    NAME_WEIGHT = 2
+    COMPLETION_DISTANCE = 0.5  # the word being typed may be a prefix of a term
+
+    def __init__(self, ingredient_index):
+        self.ingredient_index = ingredient_index
+        self._names = {}    # name word -> set of recipe IDs
+        self._deletes = {}  # deletion variant -> terms it was derived from
+        self._terms = []    # sorted vocabulary, for prefix completion
+        self._known = set()
+
+    @staticmethod
+    def words(text):
+        return re.findall(r"[^\W\d_]+", text.casefold())
+
+    @classmethod
+    def max_distance(cls, word):
+        """Edits tolerated in a query word; short words must be nearly exact"""
+        if len(word) <= 2:
+            return 0
+        return 1 if len(word) <= 4 else cls.MAX_DISTANCE
+
+    def _variants(self, word, distance):
+        word = word[:self.PREFIX_LENGTH]
+        variants = frontier = {word}
+        for _ in range(distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            variants = variants | frontier
+        return variants
+
+    @staticmethod
+    def distance(a, b, limit):
+        """Optimal string alignment distance, or limit + 1 once it exceeds limit"""
+        if abs(len(a) - len(b)) > limit:
+            return limit + 1
+        before = None
+        previous = list(range(len(b) + 1))
+        for i, ca in enumerate(a, 1):
+            current = [i] + [0] * len(b)
+            for j, cb in enumerate(b, 1):
+                value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+                if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                    value = min(value, before[j - 2] + 1)
+                current[j] = value
+            if min(current) > limit:
+                return limit + 1
+            before, previous = previous, current
+        return min(previous[-1], limit + 1)
+
+    def _add_term(self, term):
+        if term in self._known:
+            return
+        self._known.add(term)
+        bisect.insort(self._terms, term)
+        for variant in self._variants(term, self.MAX_DISTANCE):
+            self._deletes.setdefault(variant, []).append(term)
+
+    def build(self, recipes):
+        for recipe in recipes:
+            recipe_id = recipe['id']
+            for word in self.words(recipe['name']):
+                self._names.setdefault(word, set()).add(recipe_id)
+        terms = set(self._names) | set(self.ingredient_index.vocabulary())
+        self._terms = sorted(terms - self._known)
+        self._known |= terms
+        for term in self._terms:
+            for variant in self._variants(term, self.MAX_DISTANCE):
+                self._deletes.setdefault(variant, []).append(term)
+
+    def add(self, recipe):
+        recipe_id = recipe['id']
+        for word in self.words(recipe['name']):
+            self._names.setdefault(word, set()).add(recipe_id)
+            self._add_term(word)
+        for line in recipe['ingredients']:
+            for token in IngredientIndex.tokenize(line):
+                self._add_term(token)
+
+    def remove(self, recipe):
+        for word in self.words(recipe['name']):
+            postings = self._names.get(word)
+            if postings is not None:
+                postings.discard(recipe['id'])
+                if not postings:
+                    del self._names[word]
+
+    def _candidates(self, word, complete):
+        """Vocabulary terms close to word -> their (possibly fractional) distance"""
+        limit = self.max_distance(word)
+        found = {}
+        for variant in self._variants(word, limit):
+            for term in self._deletes.get(variant, ()):
+                if term not in found:
+                    found[term] = self.distance(word, term, limit)
+        found = {term: d for term, d in found.items() if d <= limit}
+        if complete and len(word) >= 2:
+            i = bisect.bisect_left(self._terms, word)
+            for term in self._terms[i:i + self.MAX_COMPLETIONS]:
+                if not term.startswith(word):
+                    break
+                found.setdefault(term, self.COMPLETION_DISTANCE)
+        return found
+
+    def _levels(self, word, complete):
+        """Disjoint (score, bitset) levels for one query word, best first"""
+        candidates = self._candidates(word, complete)
+        normalized = IngredientIndex.normalize(word)
+        if normalized != word:
+            for term, d in self._candidates(normalized, False).items():
+                candidates[term] = min(d, candidates.get(term, d))
+
+        by_score = {}
+        for term, d in candidates.items():
+            closeness = self.MAX_DISTANCE + 1 - d
+            names = self._names.get(term)
+            if names:
+                score = closeness * self.NAME_WEIGHT
+                by_score[score] = by_score.get(score, 0) | _bitset(names)
+            ingredients = self.ingredient_index._posting(term)
+            if ingredients:
+                by_score[closeness] = by_score.get(closeness, 0) | ingredients
+
+        levels = []
+        seen = 0
+        for score in sorted(by_score, reverse=True):
+            bitset = by_score[score] & ~seen
+            if bitset:
+                levels.append((score, bitset))
+                seen |= bitset
+        levels.append((0, ~seen))  # recipes this word does not match at all
+        return levels
+
+    def search(self, query, limit=50):
+        """Return up to limit (recipe ID, score) pairs, best first"""
+        words = self.words(query)[:self.MAX_WORDS]
+        if not words:
+            return []
+        # Only the word still being typed is completed as a prefix
+        complete = not query[-1:].isspace()
+        levels = [self._levels(word, complete and i == len(words) - 1) for i, word in enumerate(words)]
+        if all(len(word_levels) == 1 for word_levels in levels):
+            return []
+
+        # best[i]: the highest score words i.. can still add
+        best = [0] * (len(levels) + 1)
+        for i in range(len(levels) - 1, -1, -1):
+            best[i] = best[i + 1] + levels[i][0][0]
+
+        results = []
+        tie = 0
+        # Start from every bit set: a combination scoring above zero took at
+        # least one matching level, which bounds it to indexed recipes
+        heap = [(-best[0], tie, 0, 0, -1)]
+        while heap and len(results) < limit:
+            bound, _, i, score, bitset = heapq.heappop(heap)
+            if i == len(levels):
+                if not score:
+                    break
+                for recipe_id in self.ingredient_index._bits(bitset):
+                    results.append((recipe_id, score))
+                    if len(results) == limit:
+                        break
+                continue
+            for level_score, level_bits in levels[i]:
+                matched = bitset & level_bits
+                if matched:
+                    tie += 1
+                    heapq.heappush(heap, (-(score + level_score + best[i + 1]), tie, i + 1, score + level_score, matched))
+        return results
+
+class CatalogueRecipes(MutableMapping):
+    """Recipe ID -> record over a binary catalogue, with in-memory changes on top.
+
+    Catalogue rows are served as recipe_binary.CatalogueRecipe views; added
+    or edited recipes live in changed, and hidden holds the catalogue IDs
+    they replaced or that were deleted.
+    """
+
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self.changed = {}  # recipe ID -> Recipe record
+        self.hidden = set()
+        self._len = catalogue.count
+
+    def _in_catalogue(self, recipe_id):
+        return recipe_id not in self.hidden and self.catalogue.row_of(recipe_id) is not None
+
+    def __getitem__(self, recipe_id):
+        recipe = self.changed.get(recipe_id)
+        if recipe is not None:
+            return recipe
+        if not self._in_catalogue(recipe_id):
+            raise KeyError(recipe_id)
+        return self.catalogue.recipe(self.catalogue.row_of(recipe_id))
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self.changed or self._in_catalogue(recipe_id)
+
+    def __setitem__(self, recipe_id, recipe):
+        if recipe_id not in self:
+            self._len += 1
+        if self.catalogue.row_of(recipe_id) is not None:
+            self.hidden.add(recipe_id)
+        self.changed[recipe_id] = recipe
+
+    def __delitem__(self, recipe_id):
+        if recipe_id not in self:
+            raise KeyError(recipe_id)
+        self.changed.pop(recipe_id, None)
+        if self.catalogue.row_of(recipe_id) is not None:
+            self.hidden.add(recipe_id)
+        self._len -= 1
+
+    def __iter__(self):
+        for recipe_id in self.catalogue.ids:
+            if recipe_id not in self.hidden:
+                yield recipe_id
+        yield from list(self.changed)
+
+    def __len__(self):
+        return self._len
+
+    def snapshot(self):
+        """The current records, re-iterable and unaffected by later edits"""
+        return _CatalogueSnapshot(self.catalogue, frozenset(self.hidden), list(self.changed.values()))
+
+
+class _CatalogueSnapshot:
+    """What CatalogueRecipes.snapshot() returns: catalogue rows are read on iteration"""
+
+    def __init__(self, catalogue, hidden, changed):
+        self.catalogue = catalogue
+        self.hidden = hidden
+        self.changed = changed
+
+    def __iter__(self):
+        for row, recipe_id in enumerate(self.catalogue.ids):
+            if recipe_id not in self.hidden:
+                yield self.catalogue.recipe(row)
+        yield from self.changed
+
+
+class CatalogueNameIndex:
+    """AVLTree-compatible name index: the catalogue's sorted name table plus an overlay"""
+
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self.overlay = AVLTree()  # names added or re-keyed since the catalogue was built
+        self.removed = set()      # casefolded catalogue names no longer present
+
+    def __len__(self):
+        return self.catalogue.count - len(self.removed) + len(self.overlay)
+
+    def __contains__(self, name):
+        return self.search(name) is not None
+
+    def __iter__(self):
+        """Yield recipes in name order"""
+        keys = self.catalogue.keys
+        base = (self.catalogue.recipe(row) for row in range(self.catalogue.count) if keys[row] not in self.removed)
+        return heapq.merge(base, self.overlay, key=lambda recipe: recipe['name'].casefold())
+
+    def _catalogue_row(self, name):
+        key = name.casefold()
+        return None if key in self.removed else self.catalogue.find_row(key)
+
+    def insert(self, recipe):
+        return self.overlay.insert(recipe)
+
+    def search(self, name):
+        recipe = self.overlay.search(name)
+        if recipe is None:
+            row = self._catalogue_row(name)
+            if row is not None:
+                recipe = self.catalogue.recipe(row)
+        return recipe
+
+    def delete(self, name):
+        removed = self.overlay.delete(name)
+        row = self._catalogue_row(name)
+        if row is not None:
+            self.removed.add(name.casefold())
+            if removed is None:
+                removed = self.catalogue.recipe(row)
+        return removed
+
+    def update(self, old_name, recipe):
+        self.delete(old_name)
+        return self.insert(recipe)
+
+
+class CatalogueSearchIndex(SearchIndex):
+    """SearchIndex over the catalogue's prebuilt word and trigram tables.
+
+    The inherited structures index only names added since the catalogue was
+    built; names removed since are filtered out of catalogue results.
+    """
+
+    def __init__(self, catalogue, recipes):
+        super().__init__()
+        self.catalogue = catalogue
+        self.removed = set()
+        for recipe_id in recipes.hidden:
+            self.removed.add(catalogue.keys[catalogue.row_of(recipe_id)])
+        super().build(recipe.name for recipe in recipes.changed.values())
+
+    def build(self, names):
+        pass
+
+    def remove(self, name):
+        super().remove(name)
+        self.removed.add(self._key(name))
+
+    def _catalogue_keys(self, rows):
+        keys = self.catalogue.keys
+        return {keys[row] for row in rows} - self.removed
+
+    def _prefix_matches(self, prefix):
+        words = self.catalogue.words
+        rows = set()
+        for i in words.prefix_range(prefix):
+            rows.update(words.postings(i))
+        return super()._prefix_matches(prefix) | self._catalogue_keys(rows)
+
+    def _substring_matches(self, query):
+        grams = self.catalogue.grams
+        postings = sorted((grams.lookup(gram) for gram in self._grams_of(query)), key=len)
+        rows = set(postings[0]) if postings else set()
+        for rows_with_gram in postings[1:]:
+            if not rows:
+                break
+            rows.intersection_update(rows_with_gram)
+        matches = {key for key in self._catalogue_keys(rows) if query in key}
+        return super()._substring_matches(query) | matches
+
+
+class CatalogueIngredientIndex(IngredientIndex):
+    """IngredientIndex over the catalogue's prebuilt token postings.
+
+    The inherited structures index recipes added or edited since the
+    catalogue was built, and _hidden holds the catalogue IDs they replaced.
+    Catalogue postings stay in the memory map and become bitsets per query.
+    """
+
+    def __init__(self, catalogue, recipes):
+        super().__init__()
+        self.catalogue = catalogue
+        self._hidden = set()
+        self._hidden_bits = 0
+        self._catalogue_all = None
+        self._terms = None
+        for recipe_id in recipes.hidden:
+            self._hide(recipe_id)
+        super().build(recipes.changed.values())
+
+    def build(self, recipes):
+        pass
+
+    def _hide(self, recipe_id):
+        if recipe_id not in self._hidden and self.catalogue.row_of(recipe_id) is not None:
+            self._hidden.add(recipe_id)
+            self._hidden_bits = None
+
+    def _hidden_bitset(self):
+        if self._hidden_bits is None:
+            self._hidden_bits = _bitset(self._hidden)
+        return self._hidden_bits
+
+    def add(self, recipe):
+        self._hide(recipe['id'])
+        super().add(recipe)
+
+    def remove(self, recipe_id):
+        self._hide(recipe_id)
+        super().remove(recipe_id)
+
+    def _posting(self, token):
+        bitset = _bitset(self.catalogue.tokens.lookup(token))
+        return (bitset & ~self._hidden_bitset()) | super()._posting(token)
+
+    def _universe(self):
+        if self._catalogue_all is None:
+            self._catalogue_all = _bitset(self.catalogue.ids)
+        return (self._catalogue_all & ~self._hidden_bitset()) | super()._universe()
+
+    def _catalogue_terms(self):
+        if self._terms is None:
+            terms = self.catalogue.tokens.terms
+            self._terms = [terms[i] for i in range(len(terms))]
+        return self._terms
+
+    def vocabulary(self):
+        return set(self._catalogue_terms()) | super().vocabulary()
+
+    def _tokens_of(self, recipe_id):
+        tokens = self._tokens.get(recipe_id)
+        if tokens is None:
+            terms = self._catalogue_terms()
+            row = self.catalogue.row_of(recipe_id)
+            tokens = frozenset(terms[i] for i in self.catalogue.row_tokens(row))
+        return tokens
+
+
+class RecipeStore:
+    """Headless recipe catalogue: storage, name/search/ingredient indexes and CRUD.
+
+    Nothing here imports tkinter or the AI client, so batch jobs, the CLI and
+    benchmarks pay only for what they use. The prefix/trigram, ingredient and fuzzy
+    indexes are built on first use and maintained incrementally afterwards.
+    Loaded recipes are compact recipe_model.Recipe records; get() returns
+    plain dicts. When the storage has an up-to-date binary catalogue, the
+    records, name tree and indexes are views over its memory map instead,
+    with only the journal's changes held in memory.
+    """
+
+    RELATED_REBUILD_BATCH = 1000
+
+    def __init__(self, storage=None):
+        self.storage = storage if storage is not None else open_storage()
+        self.pool = RecipePool()
+        self.recipes = {}  # recipe ID -> Recipe record
+        self.recipe_tree = AVLTree()
+        self.sorted_ids = []  # recipe IDs in name-index order
+        self.catalogue = None  # recipe_binary.BinaryCatalogue, if one was opened
+        self._search_index = None
+        self._ingredient_index = None
+        self._fuzzy_index = None
+        self._related_index = None
+        self._assistant = None
+
+    def __len__(self):
+        return len(self.recipes)
+
+    @property
+    def search_index(self):
+        if self._search_index is None:
+            if self.storage.supports_fulltext:
+                self._search_index = FTSNameIndex(self.storage)
+            elif self.catalogue is not None:
+                self._search_index = CatalogueSearchIndex(self.catalogue, self.recipes)
+            else:
+                self._search_index = SearchIndex()
+            self._search_index.build(recipe.name for recipe in self.recipes.values())
+        return self._search_index
+
+    @property
+    def ingredient_index(self):
+        if self._ingredient_index is None:
+            if self.catalogue is not None:
+                self._ingredient_index = CatalogueIngredientIndex(self.catalogue, self.recipes)
+            else:
+                self._ingredient_index = IngredientIndex()
+            self._ingredient_index.build(self.recipes.values())
+        return self._ingredient_index
+
+    @property
+    def fuzzy_index(self):
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyIndex(self.ingredient_index)
+            self._fuzzy_index.build(self.recipes.values())
+        return self._fuzzy_index
+
+    @property
+    def related_index(self):
+        """Similar-recipe neighbours, computed in one batch on first use"""
+        if self._related_index is None:
+            from recipe_related import RelatedIndex
+
+            related_index = RelatedIndex(self.ingredient_index)
+            related_index.build(self.recipes)
+            self._related_index = related_index
+        return self._related_index
+
+    def prepare_related_index(self):
+        """Attach an unbuilt related index and snapshot its input.
+
+        The caller runs compute() on the result, which reads nothing from
+        the store, and then finish() wherever it would make edits; edits in
+        between are queued. This keeps the slow part off a GUI's main loop.
+        """
+        from recipe_related import RelatedIndex
+
+        self._related_index = RelatedIndex(self.ingredient_index)
+        self._related_index.prepare(self.recipes)
+        return self._related_index
+
+    def build_indexes(self):
+        """Build every index now rather than on first search"""
+        self.search_index
+        self.ingredient_index
+        self.fuzzy_index
+
+    def iter_load(self, batch_size=1000):
+        """Load the catalogue from storage, yielding each batch as it is indexed"""
+        opened = self.storage.open_catalogue()
+        if opened is not None:
+            # Nothing to stream: the binary catalogue is usable as soon as it is mapped
+            self._open_catalogue(*opened)
+            return
+        for batch in self.storage.iter_load(batch_size):
+            # Batches are converted as they stream in, so the parsed dicts never pile up
+            batch = [self.pool.make(recipe) for recipe in batch]
+            for recipe in batch:
+                self.recipes[recipe.id] = recipe
+                self.recipe_tree.insert(recipe)  # Insert each recipe into the name index
+            yield batch
+        self.sorted_ids = [recipe.id for recipe in self.recipe_tree]
+
+    def _open_catalogue(self, catalogue, overrides):
+        """Serve the store from a binary catalogue, replaying journal overrides on top"""
+        self.catalogue = catalogue
+        self.recipes = CatalogueRecipes(catalogue)
+        self.recipe_tree = CatalogueNameIndex(catalogue)
+        for recipe_id, recipe in overrides.items():
+            old = self.recipes.get(recipe_id)
+            if old is not None:
+                self.recipe_tree.delete(old['name'])
+                del self.recipes[recipe_id]
+            if recipe is not None:
+                record = self.pool.make(recipe)
+                self.recipes[recipe_id] = record
+                self.recipe_tree.insert(record)
+
+        self.sorted_ids = catalogue.ids.tolist()
+        if self.recipes.hidden:
+            self.sorted_ids = [recipe_id for recipe_id in self.sorted_ids if recipe_id not in self.recipes.hidden]
+        for record in self.recipes.changed.values():
+            self.sorted_ids.insert(self.sorted_row(record.name), record.id)
+
+    def load(self):
+        for _ in self.iter_load():
+            pass
+        return self
+
+    def get(self, recipe_id):
+        """Return the full recipe (instructions included) for an ID as a dict"""
+        recipe = self.storage.fetch(self.recipes[recipe_id])
+        return recipe if isinstance(recipe, dict) else recipe.to_dict()
+
+    def find(self, name):
+        """Return the recipe with this name (case-insensitive), or None"""
+        return self.recipe_tree.search(name)
+
+    def sorted_row(self, name):
+        """Position of a name in sorted_ids (or where it would be inserted)"""
+        return bisect.bisect_left(
+            self.sorted_ids, name.casefold(),
+            key=lambda recipe_id: self.recipes[recipe_id].name.casefold()
+        )
+
+    def _check_name(self, name, recipe_id=None):
+        if not name:
+            raise ValueError("Recipe name cannot be empty!")
+        existing = self.recipe_tree.search(name)
+        if existing is not None and existing.id != recipe_id:
+            raise ValueError(f"A recipe with name '{name}' already exists!")
+
+    @traced('store.add')
+    def add(self, name, ingredients, instructions):
+        """Create, index and persist a new recipe; raises ValueError on a bad name"""
+        self._check_name(name)
+        recipe = {
+            'id': self.storage.allocate_id(),
+            'name': name,
+            'ingredients': list(ingredients),
+            'instructions': list(instructions)
+        }
+        record = self.pool.make(recipe)
+        self.recipes[record.id] = record
+        self.recipe_tree.insert(record)
+        self.sorted_ids.insert(self.sorted_row(name), record.id)
+        if self._search_index is not None:
+            self._search_index.add(name)
+        if self._ingredient_index is not None:
+            self._ingredient_index.add(record)
+        if self._fuzzy_index is not None:
+            self._fuzzy_index.add(record)
+        if self._related_index is not None:
+            self._related_index.add(record.id)
+        self._persist(recipe)
+        return record
+
+    @traced('store.add_many')
+    def add_many(self, recipes):
+        """Create, index and persist a batch of recipes in one storage commit.
+
+        Each item is a dict with name, ingredients and instructions. The whole
+        batch is validated first, so a bad or duplicate name raises ValueError
+        before anything is stored. Unlike add(), this never compacts the
+        journal; bulk loaders call save() once they are done.
+        """
+        recipes = list(recipes)  # Read twice; a generator would be spent by the checks
+        seen = set()
+        for recipe in recipes:
+            self._check_name(recipe['name'])
+            key = recipe['name'].casefold()
+            if key in seen:
+                raise ValueError(f"A recipe with name '{recipe['name']}' already exists!")
+            seen.add(key)
+
+        recipes = [
+            {
+                'id': self.storage.allocate_id(),
+                'name': recipe['name'],
+                'ingredients': list(recipe['ingredients']),
+                'instructions': list(recipe['instructions'])
+            }
+            for recipe in recipes
+        ]
+        self.storage.put_many(recipes)
+
+        added = []
+        for recipe in recipes:
+            recipe = self.pool.make(recipe)
+            self.recipes[recipe.id] = recipe
+            self.recipe_tree.insert(recipe)
+            if self._search_index is not None:
+                self._search_index.add(recipe.name)
+            if self._ingredient_index is not None:
+                self._ingredient_index.add(recipe)
+            if self._fuzzy_index is not None:
+                self._fuzzy_index.add(recipe)
+            added.append(recipe)
+        if self._related_index is not None:
+            if len(added) > self.RELATED_REBUILD_BATCH:
+                # Cheaper to rebuild in one batch than to fold in one by one
+                self._related_index = None
+            else:
+                for recipe in added:
+                    self._related_index.add(recipe.id)
+
+        # One sort merges the batch into the (already sorted) view in place
+        self.sorted_ids.extend(recipe.id for recipe in added)
+        self.sorted_ids.sort(key=lambda recipe_id: self.recipes[recipe_id].name.casefold())
+        return added
+
+    @traced('store.update')
+    def update(self, recipe_id, name, ingredients, instructions, details=None):
+        """Replace a recipe's contents, keeping its ID; raises ValueError on a bad name.
+
+        Extra fields (cook_time, tags, ...) are kept; details sets or, with a
+        None value, removes them.
+        """
+        self._check_name(name, recipe_id)
+        self._check_details(details)
+        record, recipe = self._replace(recipe_id, name, ingredients, instructions, details)
+        self._persist(recipe)
+        return record
+
+    @traced('store.update_many')
+    def update_many(self, changes):
+        """Replace a batch of recipes in one storage commit.
+
+        Each item is a dict with id, name, ingredients, instructions and
+        optionally details, as for update(). The whole batch is validated
+        first, so a bad name raises ValueError before anything changes. Like
+        add_many(), this never compacts the journal; call save() when done.
+        """
+        changes = list(changes)
+        owners = {}
+        for change in changes:
+            self._check_name(change['name'], change['id'])
+            self._check_details(change.get('details'))
+            if owners.setdefault(change['name'].casefold(), change['id']) != change['id']:
+                raise ValueError(f"A recipe with name '{change['name']}' already exists!")
+
+        updated = []
+        recipes = []
+        for change in changes:
+            record, recipe = self._replace(
+                change['id'], change['name'], change['ingredients'], change['instructions'], change.get('details')
+            )
+            updated.append(record)
+            recipes.append(recipe)
+        self.storage.put_many(recipes)
+        return updated
+
+    @staticmethod
+    def _check_details(details):
+        for key in details or ():
+            if key in Recipe._KEYS:
+                raise ValueError(f"'{key}' is not a detail field")
+
+    def _replace(self, recipe_id, name, ingredients, instructions, details):
+        """Swap a new record in for recipe_id and reindex it; returns (record, dict to persist)"""
+        old = self.recipes[recipe_id]
+        recipe = {
+            'id': recipe_id,
+            'name': name,
+            'ingredients': list(ingredients),
+            'instructions': list(instructions)
+        }
+        recipe.update((key, old[key]) for key in old.keys() if key not in recipe)
+        for key, value in (details or {}).items():
+            if value is None:
+                recipe.pop(key, None)
+            else:
+                recipe[key] = value
+        record = self.pool.make(recipe)
+
+        # Move the row within the sorted view (it keeps its ID)
+        del self.sorted_ids[self.sorted_row(old.name)]
+        self.recipes[recipe_id] = record
+        self.sorted_ids.insert(self.sorted_row(name), recipe_id)
+
+        # Update the name index in place (re-keyed on rename)
+        self.recipe_tree.update(old.name, record)
+        if self._search_index is not None:
+            self._search_index.remove(old.name)
+            self._search_index.add(name)
+        if self._ingredient_index is not None:
+            self._ingredient_index.add(record)
+        if self._fuzzy_index is not None:
+            self._fuzzy_index.remove(old)
+            self._fuzzy_index.add(record)
+        if self._related_index is not None:
+            self._related_index.add(recipe_id)
+        self._release(old)
+        return record, recipe
+
+    @traced('store.delete')
+    def delete(self, recipe_id):
+        recipe = self.recipes[recipe_id]
+        del self.sorted_ids[self.sorted_row(recipe.name)]
+        del self.recipes[recipe_id]
+        self.recipe_tree.delete(recipe.name)
+        if self._search_index is not None:
+            self._search_index.remove(recipe.name)
+        if self._ingredient_index is not None:
+            self._ingredient_index.remove(recipe_id)
+        if self._fuzzy_index is not None:
+            self._fuzzy_index.remove(recipe)
+        if self._related_index is not None:
+            self._related_index.remove(recipe_id)
+        self._release(recipe)
+        self.storage.delete(recipe_id)
+        self._maybe_compact()
+        return recipe
+
+    def _persist(self, recipe):
+        self.storage.put(recipe)
+        self._maybe_compact()
+
+    def _release(self, recipe):
+        # Instructions of replaced records stay in the pool's buffer until a
+        # vacuum, which waits while a background compaction reads the records
+        self.pool.release(recipe)
+        if self.pool.needs_vacuum() and not self.storage.compacting:
+            self.pool.vacuum(self.recipes.values())
+
+    def _maybe_compact(self):
+        if self.storage.needs_compaction():
+            self.save(background=True)
+
+    def _snapshot(self):
+        """The live records, re-iterable and unaffected by later edits"""
+        if isinstance(self.recipes, CatalogueRecipes):
+            return self.recipes.snapshot()
+        return list(self.recipes.values())
+
+    @traced('store.save')
+    def save(self, background=False):
+        """Write a full snapshot of all recipes (journal compaction).
+
+        In the background, edits only pay for listing the records; the
+        storage writes them on a thread of its own (storage.wait() joins it).
+        """
+        self.storage.compact(self._snapshot(), background)
+
+    def search_names(self, query, limit=None):
+        """IDs of recipes whose name matches query, an exact hit first.
+
+        With a limit only the first limit names are ordered and looked up,
+        which keeps one-letter queries cheap for callers that page.
+        """
+        query = query.strip().casefold()
+        keys = self.search_index.search(query)
+        keys = sorted(keys) if limit is None else heapq.nsmallest(limit, keys)
+        if limit != 0 and query in self.recipe_tree:
+            if query in keys:
+                keys.remove(query)
+            elif limit is not None and len(keys) == limit:
+                # The exact hit sorted past the limit; it takes the last place
+                keys.pop()
+            keys.insert(0, query)
+        return [self.recipe_tree.search(key).id for key in keys]
+
+    def search_ingredients(self, query):
+        """IDs matching a boolean ingredient query, in name order"""
+        return sorted(
+            self.ingredient_index.query(query),
+            key=lambda recipe_id: self.recipes[recipe_id].name.casefold()
+        )
+
+    def can_make(self, pantry):
+        """(recipe ID, matched, total) tuples ranked by pantry coverage"""
+        return self.ingredient_index.can_make(pantry)
+
+    def related(self, recipe_id, limit=None):
+        """IDs of the recipes most similar in ingredients, best first"""
+        return self.related_index.related(recipe_id, limit)
+
+    def search_fuzzy(self, query, limit=50):
+        """IDs of the recipes closest to a possibly misspelt query, best first"""
+        return [recipe_id for recipe_id, _ in self.fuzzy_index.search(query, limit)]
+
+    def search_text(self, query):
+        """Full-text search over instructions (SQLite backend only)"""
+        if not self.storage.supports_fulltext:
+            raise ValueError("Full-text search needs the SQLite catalogue (recipes.db)")
+        return self.storage.search_text(query)
+
+    def assistant(self, model=None, cache=None):
+        """The AI assistant service, created (and its client imported) on first use"""
+        if self._assistant is None:
+            from recipe_ai import AssistantService, create_model
+
+            self._assistant = AssistantService(model if model is not None else create_model(), cache=cache)
+        return self._assistant
+
+    def stats(self):
+        return {
+            'recipes': len(self.recipes),
+            'backend': type(self.storage).__name__,
+            'ingredient_lines': sum(len(recipe.ingredients) for recipe in self.recipes.values()),
+            'journal_records': getattr(self.storage, 'journal_records', 0),
+            'binary_catalogue': self.catalogue is not None,
+            **self.pool.stats(),
+        }
+
+    def close(self):
+        if self._assistant is not None:
+            self._assistant.shutdown()
+        self.storage.close()
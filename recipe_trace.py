@@ -0,0 +1,241 @@
+"""Lightweight timing of hot paths, with histograms, dumps and one-shot profiling.
+
+Handlers are wrapped with @traced('name'). While tracing is disabled the
+wrapper costs a single attribute check; once enabled (tracer.enable(), or
+RECIPE_TRACE=1 in the environment) every call lands in a per-operation
+histogram. Stats can be written as JSON, or as Prometheus text when the
+dump path ends in .prom, and profile_next() runs the next traced
+interaction under cProfile.
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds (Prometheus-style, cumulative on export)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; percentiles are bucket upper bounds"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        """Milliseconds, for display and the JSON dump"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50) * 1000, 3),
+            'p90_ms': round(self.percentile(0.90) * 1000, 3),
+            'p99_ms': round(self.percentile(0.99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class Tracer:
+    """Per-operation histograms, filled only while enabled"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.last_operation = None  # most recent outermost operation, for stall reports
+        self.last_finished = 0.0
+        self.last_stall = None
+        self.profile_dir = '.'
+        self.last_profile = None
+        self._profile_armed = False
+        self._lock = threading.Lock()
+        self._local = threading.local()  # per-thread outermost operation
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.last_stall = None
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def traced(self, name):
+        """Decorator timing every call of a function as operation name"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                return self._call(name, fn, args, kwargs)
+            return wrapper
+        return decorate
+
+    def span(self, name):
+        """Context manager timing a block as operation name"""
+        return _Span(self, name)
+
+    def _call(self, name, fn, args, kwargs):
+        outermost = getattr(self._local, 'active', None) is None
+        if outermost:
+            self._local.active = name
+        profiler = None
+        if outermost and self._profile_armed:
+            self._profile_armed = False
+            import cProfile
+
+            profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                return profiler.runcall(fn, *args, **kwargs)
+            return fn(*args, **kwargs)
+        finally:
+            self.record(name, time.perf_counter() - started)
+            if outermost:
+                self._local.active = None
+                self.last_operation = name
+                self.last_finished = time.perf_counter()
+            if profiler is not None:
+                self._save_profile(name, profiler)
+
+    def profile_next(self, directory=None):
+        """Run the next outermost traced call under cProfile (enables tracing)"""
+        if directory is not None:
+            self.profile_dir = directory
+        self.enabled = True
+        self._profile_armed = True
+
+    def _save_profile(self, name, profiler):
+        import io
+        import pstats
+
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.profile_dir, f"profile-{name}-{stamp}.prof")
+        profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(25)
+        with open(path[:-len('.prof')] + '.txt', 'w') as f:
+            f.write(text.getvalue())
+        self.last_profile = path
+
+    def snapshot(self):
+        with self._lock:
+            operations = {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+        return {'timestamp': time.time(), 'operations': operations, 'last_stall': self.last_stall}
+
+    def to_prometheus(self):
+        lines = [
+            '# HELP recipe_operation_seconds Duration of traced recipe manager operations.',
+            '# TYPE recipe_operation_seconds histogram',
+        ]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += n
+                    lines.append(f'recipe_operation_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'recipe_operation_seconds_sum{{operation="{name}"}} {histogram.total}')
+                lines.append(f'recipe_operation_seconds_count{{operation="{name}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """Atomically write the stats to path (Prometheus text for .prom, else JSON)"""
+        if path.endswith('.prom'):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.snapshot(), indent=4)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'started')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class StallMonitor:
+    """Detects event-loop stalls by timing a heartbeat scheduled with root.after.
+
+    A heartbeat that fires more than threshold_ms late means the loop was
+    blocked; the delay is recorded as the 'tk_stall' operation together with
+    the traced operation that finished during the stall, if any.
+    """
+
+    def __init__(self, root, tracer, interval_ms=100, threshold_ms=200):
+        self.root = root
+        self.tracer = tracer
+        self.interval = interval_ms / 1000
+        self.interval_ms = interval_ms
+        self.threshold = threshold_ms / 1000
+        self.stalls = 0
+        self._expected = None
+
+    def start(self):
+        self._expected = time.perf_counter() + self.interval
+        self.root.after(self.interval_ms, self._beat)
+
+    def _beat(self):
+        now = time.perf_counter()
+        late = now - self._expected
+        if late > self.threshold and self.tracer.enabled:
+            self.stalls += 1
+            self.tracer.record('tk_stall', late)
+            # The blocking handler has returned by now; None means untraced work
+            during = None
+            if self.tracer.last_finished >= self._expected - self.interval:
+                during = self.tracer.last_operation
+            self.tracer.last_stall = {'at': time.time(), 'ms': round(late * 1000, 1), 'during': during}
+        self._expected = now + self.interval
+        self.root.after(self.interval_ms, self._beat)
+
+
+tracer = Tracer(enabled=bool(os.environ.get('RECIPE_TRACE')))
+traced = tracer.traced
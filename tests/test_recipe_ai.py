@@ -0,0 +1,182 @@
+import threading
+
+import pytest
+
+import recipe_ai
+from recipe_ai import AssistantService, FakeModel, ResponseCache
+
+REPLY = "Chop the onions, fry them gently, then add the rice and stock."
+
+
+class Recorder:
+    """Collects on_chunk/on_done calls from the assistant's worker threads"""
+
+    def __init__(self):
+        self.chunks = []
+        self.errors = []
+        self.first_chunk = threading.Event()
+        self.done = threading.Event()
+
+    def on_chunk(self, request, text):
+        self.chunks.append(text)
+        self.first_chunk.set()
+
+    def on_done(self, request, error):
+        self.errors.append(error)
+        self.done.set()
+
+    def wait(self):
+        assert self.done.wait(5), "on_done was never called"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'ai_cache.db'))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(recipe_ai.time, 'time', lambda: now[0])
+    return now
+
+
+def test_streams_reply_in_chunks():
+    service = AssistantService(FakeModel(latency=0, chunk_delay=0, chunk_size=8, reply=REPLY))
+    recorder = Recorder()
+    request = service.submit("risotto", recorder.on_chunk, recorder.on_done)
+    recorder.wait()
+    service.shutdown()
+
+    assert recorder.chunks == [REPLY[i:i + 8] for i in range(0, len(REPLY), 8)]
+    assert recorder.errors == [None]
+    assert not request.cached
+    assert service.pending == {}
+
+
+def test_model_error_reaches_on_done():
+    service = AssistantService(FakeModel(latency=0, failure_rate=1.0))
+    recorder = Recorder()
+    service.submit("risotto", recorder.on_chunk, recorder.on_done)
+    recorder.wait()
+    service.shutdown()
+
+    assert recorder.chunks == []
+    assert isinstance(recorder.errors[0], recipe_ai.FakeModelError)
+
+
+def test_cancel_stops_in_flight_stream(cache):
+    model = FakeModel(latency=0, chunk_delay=0.02, chunk_size=1, reply=REPLY)
+    service = AssistantService(model, cache=cache)
+    recorder = Recorder()
+    request = service.submit("risotto", recorder.on_chunk, recorder.on_done)
+    assert recorder.first_chunk.wait(5)
+    assert service.cancel_all() == [request]
+    recorder.wait()
+    service.shutdown()
+
+    assert request.cancelled
+    assert 0 < len(recorder.chunks) < len(REPLY)
+    assert recorder.errors == [None]
+    # A partial reply must not be cached
+    assert cache.get(request.cache_key) is None
+
+
+def test_cancel_skips_queued_request():
+    started = threading.Event()
+    release = threading.Event()
+
+    def reply(prompt):
+        started.set()
+        release.wait(5)
+        return REPLY
+
+    model = FakeModel(latency=0, chunk_delay=0, reply=reply)
+    service = AssistantService(model, max_workers=1)
+    first, second = Recorder(), Recorder()
+    service.submit("risotto", first.on_chunk, first.on_done)
+    assert started.wait(5)
+    queued = service.submit("paella", second.on_chunk, second.on_done)
+    service.cancel_all()
+    release.set()
+    first.wait()
+    second.wait()
+    service.shutdown()
+
+    assert queued.cancelled
+    assert second.chunks == [] and second.errors == [None]
+    assert model.calls == 1
+
+
+def test_repeat_query_is_answered_from_memory(cache):
+    model = FakeModel(latency=0, chunk_delay=0, reply=REPLY)
+    service = AssistantService(model, cache=cache)
+    first = Recorder()
+    service.submit("Mushroom Risotto", first.on_chunk, first.on_done)
+    first.wait()
+
+    # Normalized like the first query, so it is a hit; answered inline
+    second = Recorder()
+    request = service.submit("  mushroom   risotto! ", second.on_chunk, second.on_done)
+    service.shutdown()
+
+    assert second.done.is_set()
+    assert request.cached
+    assert second.chunks == [REPLY]
+    assert model.calls == 1
+    assert cache.stats()['memory_hits'] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / 'ai_cache.db')
+    cache = ResponseCache(path)
+    cache.put('k', REPLY)
+    cache.close()
+
+    cache = ResponseCache(path)
+    assert cache.get_memory('k') is None
+    assert cache.get('k') == REPLY
+    assert cache.get_memory('k') == REPLY  # Promoted to the memory tier
+    assert cache.stats()['disk_hits'] == 1
+    cache.close()
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'ai_cache.db'), memory_items=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get_memory('a') == 'A'  # Now b is the oldest
+    cache.put('c', 'C')
+
+    assert list(cache.memory) == ['a', 'c']
+    assert cache.get_memory('b') is None
+    assert cache.get('b') == 'B'  # Still on disk
+    cache.close()
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / 'ai_cache.db'), ttl=60)
+    cache.put('k', REPLY)
+    clock[0] += 59
+    assert cache.get('k') == REPLY
+
+    clock[0] += 2
+    assert cache.get_memory('k') is None
+    assert cache.get('k') is None
+    assert cache.stats()['misses'] == 1
+    cache.close()
+
+
+def test_disk_tier_evicts_least_recently_accessed(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / 'ai_cache.db'), memory_items=0, max_bytes=25)
+    for key in 'abc':
+        cache.put(key, key * 10)
+        clock[0] += 1
+    # Over the limit after c, so a (accessed first) made room
+
+    assert cache.get('a') is None
+    assert cache.get('b') == 'b' * 10
+    assert cache.get('c') == 'c' * 10
+    cache.close()
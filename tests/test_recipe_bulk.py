@@ -0,0 +1,81 @@
+import csv
+import os
+
+import pytest
+
+from recipe_bulk import bulk_import, export_recipes, iter_chunks, parse_chunk
+from recipe_storage import JournalStorage
+from recipe_store import RecipeStore
+
+RECIPES = [
+    {'name': 'Pancakes', 'ingredients': ['flour', 'milk', 'eggs'], 'instructions': ['Whisk', 'Fry']},
+    {'name': 'Quoted "Stew"', 'ingredients': ['beef, diced', 'stock'], 'instructions': ['Brown\nthe beef', 'Simmer']},
+    {'name': 'Toast', 'ingredients': ['bread'], 'instructions': ['Toast it']},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+    yield store
+    store.close()
+
+
+def recipes_of(store):
+    return [{key: store.get(recipe_id)[key] for key in ('name', 'ingredients', 'instructions')}
+            for recipe_id in store.sorted_ids]
+
+
+@pytest.mark.parametrize('fmt', ['json', 'jsonl', 'csv'])
+@pytest.mark.parametrize('workers', [0, 2])
+def test_export_then_import_round_trips(tmp_path, store, fmt, workers):
+    store.add_many(RECIPES)
+    path = str(tmp_path / f'export.{fmt}')
+    assert export_recipes(store, path) == len(RECIPES)
+
+    other = RecipeStore(JournalStorage(str(tmp_path / 'other.json'))).load()
+    report = bulk_import(other, path, workers=workers, chunk_size=1)
+    assert (report.read, report.added, report.duplicates, report.invalid) == (3, 3, 0, 0)
+    assert recipes_of(other) == recipes_of(store)
+
+    # A second import only finds duplicates
+    report = bulk_import(other, path, workers=workers)
+    assert (report.added, report.duplicates) == (0, 3)
+    other.close()
+
+
+def test_csv_chunks_never_split_a_quoted_field(tmp_path):
+    path = str(tmp_path / 'feed.csv')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('name', 'ingredients', 'instructions'))
+        for i in range(20):
+            writer.writerow((f'Dish "{i}"', 'a|b', 'first\nsecond\n"third"|fourth'))
+
+    with open(path, newline='', encoding='utf-8') as f:
+        results = [result for chunk in iter_chunks(f, 'csv', 3) for result in parse_chunk('csv', chunk)]
+    assert [recipe['name'] for _, recipe in results] == [f'Dish "{i}"' for i in range(20)]
+    assert all(recipe['instructions'] == ['first\nsecond\n"third"', 'fourth'] for _, recipe in results)
+
+
+def test_bad_records_are_counted(tmp_path, store):
+    path = str(tmp_path / 'feed.jsonl')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"name": "Soup", "ingredients": ["water"], "instructions": ["Boil"]}\n')
+        f.write('{"name": "  "}\nnot json\n\n{"name": "soup"}\n')
+    report = bulk_import(store, path, workers=0)
+    assert (report.read, report.added, report.duplicates, report.invalid) == (4, 1, 1, 2)
+
+
+def test_failed_export_leaves_no_temp_file(tmp_path, store, monkeypatch):
+    store.add_many(RECIPES)
+    path = str(tmp_path / 'export.json')
+
+    def broken(recipe_id):
+        raise OSError("disk went away")
+
+    monkeypatch.setattr(store, 'get', broken)
+    with pytest.raises(OSError):
+        export_recipes(store, path)
+    assert not os.path.exists(path + '.tmp')
+    assert not os.path.exists(path)
@@ -0,0 +1,195 @@
+import itertools
+import json
+import threading
+import time
+
+import pytest
+
+import recipe_enrich
+from recipe_ai import FakeModel, FakeModelError
+from recipe_enrich import FIELDS, EnrichmentJob, TokenBucket, fake_reply, parse_reply
+from recipe_storage import JournalStorage
+from recipe_store import RecipeStore
+
+RECIPES = 30
+
+
+def open_store(tmp_path):
+    return RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = open_store(tmp_path)
+    store.add_many([
+        {'name': f'Chicken Curry {i:02}', 'ingredients': ['2 cups rice', '1 lb chicken', f'spice {i}'],
+         'instructions': ['Cook']}
+        for i in range(RECIPES)
+    ])
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return str(tmp_path / 'enrich_checkpoint.jsonl')
+
+
+def flaky_reply(failures):
+    """A reply function that fails the first failures calls, then answers"""
+    calls = itertools.count()
+
+    def reply(prompt):
+        if next(calls) < failures:
+            raise FakeModelError("503 Service unavailable (fake)")
+        return fake_reply(prompt)
+    return reply
+
+
+def enriched(store):
+    return sum(1 for recipe_id in store.recipes if set(FIELDS) <= store.get(recipe_id).keys())
+
+
+def test_bucket_spaces_out_tokens(monkeypatch):
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(recipe_enrich.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(recipe_enrich.time, 'sleep', sleep)
+    bucket = TokenBucket(rate=4, capacity=2)
+
+    # The first two are the burst; each one after waits a quarter second
+    for _ in range(10):
+        assert bucket.acquire()
+    assert now[0] == pytest.approx(2.0)
+
+
+def test_bucket_acquire_gives_up_when_cancelled():
+    bucket = TokenBucket(rate=0.01)
+    assert bucket.acquire()
+    cancelled = threading.Event()
+    cancelled.set()
+    assert not bucket.acquire(cancelled)
+
+
+def test_job_keeps_to_requests_per_minute(store, checkpoint):
+    model = FakeModel(latency=0, reply=fake_reply)
+    job = EnrichmentJob(store, model, batch_size=5, workers=4, requests_per_minute=600, checkpoint=checkpoint)
+    started = time.monotonic()
+    report = job.run()
+    seconds = time.monotonic() - started
+
+    # Six prompts at ten a second: the first is free, the rest wait 0.1s each
+    assert model.calls == report.prompts == 6
+    assert seconds >= 0.45
+    assert report.enriched == RECIPES
+
+
+def test_retries_with_backoff_until_the_model_answers(store, checkpoint):
+    model = FakeModel(latency=0, reply=flaky_reply(3))
+    job = EnrichmentJob(
+        store, model, batch_size=RECIPES, workers=1, requests_per_minute=60000, max_retries=5, base_delay=0.01,
+        checkpoint=checkpoint
+    )
+    delays = []
+    job_backoff = job._backoff
+
+    def backoff(attempt):
+        delay = job_backoff(attempt)
+        delays.append((attempt, delay))
+        return delay
+
+    job._backoff = backoff
+    report = job.run()
+
+    assert model.calls == 4
+    assert (report.prompts, report.retries, report.enriched, report.failed) == (4, 3, RECIPES, 0)
+    assert [attempt for attempt, _ in delays] == [0, 1, 2]
+    for attempt, delay in delays:
+        full = 0.01 * 2 ** attempt
+        assert full / 2 <= delay <= full
+    assert enriched(store) == RECIPES
+
+
+def test_gives_up_after_max_retries(store, checkpoint):
+    model = FakeModel(latency=0, failure_rate=1.0)
+    job = EnrichmentJob(
+        store, model, batch_size=RECIPES, workers=1, requests_per_minute=60000, max_retries=2, base_delay=0.001,
+        checkpoint=checkpoint
+    )
+    report = job.run()
+
+    assert model.calls == 3
+    assert (report.enriched, report.failed) == (0, RECIPES)
+    assert all(error.startswith('FakeModelError') for error in job.checkpoint.failed.values())
+    # Failed recipes are left for --retry-failed
+    assert EnrichmentJob(store, None, checkpoint=checkpoint).pending() == []
+    assert len(EnrichmentJob(store, None, checkpoint=checkpoint).pending(retry_failed=True)) == RECIPES
+
+
+def test_resumes_from_checkpoint_after_interrupt(tmp_path, store, checkpoint):
+    def interrupt(report):
+        raise KeyboardInterrupt
+
+    job = EnrichmentJob(
+        store, FakeModel(latency=0.01, reply=fake_reply), batch_size=10, workers=1, requests_per_minute=60000,
+        checkpoint=checkpoint
+    )
+    with pytest.raises(KeyboardInterrupt):
+        job.run(progress=interrupt)
+    store.close()
+
+    # Only the batch written back before the interrupt is in the checkpoint
+    with open(checkpoint, encoding='utf-8') as f:
+        done = [json.loads(line)['id'] for line in f]
+    assert len(done) == 10
+
+    store = open_store(tmp_path)
+    assert enriched(store) == 10
+    model = FakeModel(latency=0, reply=fake_reply)
+    job = EnrichmentJob(store, model, batch_size=10, requests_per_minute=60000, checkpoint=checkpoint)
+    assert not set(done) & set(job.pending())
+    report = job.run()
+
+    assert model.calls == 2
+    assert report.enriched == RECIPES - 10
+    assert enriched(store) == RECIPES
+    store.close()
+
+
+def test_partial_answer_is_recorded_as_failed(store, checkpoint):
+    def no_tags(prompt):
+        answers = parse_reply(fake_reply(prompt))
+        return json.dumps([{key: value for key, value in answer.items() if key != 'tags'} for answer in answers])
+
+    job = EnrichmentJob(
+        store, FakeModel(latency=0, reply=no_tags), batch_size=RECIPES, requests_per_minute=60000,
+        checkpoint=checkpoint
+    )
+    report = job.run()
+
+    assert (report.enriched, report.failed) == (0, RECIPES)
+    assert set(job.checkpoint.failed.values()) == {"no usable tags"}
+    recipe = store.get(store.sorted_ids[0])
+    assert 'cook_time' in recipe and 'tags' not in recipe
+
+    job = EnrichmentJob(store, FakeModel(latency=0, reply=fake_reply), requests_per_minute=60000,
+                        checkpoint=checkpoint)
+    assert job.pending() == []
+    assert job.run(retry_failed=True).enriched == RECIPES
+    assert enriched(store) == RECIPES
+
+
+def test_checkpoint_entry_does_not_cover_a_renamed_recipe(store, checkpoint):
+    recipe_id = store.sorted_ids[0]
+    with open(checkpoint, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'id': recipe_id, 'name': 'Deleted Soup', 'error': None}) + '\n')
+        # Logs written before names were kept cover whatever has the ID
+        f.write(json.dumps({'id': store.sorted_ids[1], 'error': None}) + '\n')
+
+    pending = EnrichmentJob(store, None, checkpoint=checkpoint).pending()
+    assert recipe_id in pending
+    assert store.sorted_ids[1] not in pending
+    assert len(pending) == RECIPES - 1
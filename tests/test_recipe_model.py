@@ -0,0 +1,42 @@
+import pytest
+
+from recipe_model import RecipePool
+
+ODD_LINES = [
+    [],
+    [''],
+    ['', ''],
+    ['a\x1eb'],
+    ['\x1e', '\x1b', '\x1b1', '\x1b0\x1e', 'x\x1b\x1ey'],
+    ['Preheat the oven.', 'Bake for 20 minutes — until golden.'],
+]
+
+
+@pytest.mark.parametrize('instructions', ODD_LINES)
+def test_instructions_round_trip(instructions):
+    pool = RecipePool()
+    record = pool.make({'id': 1, 'name': 'Bread', 'ingredients': ['flour'], 'instructions': instructions})
+    assert record.instructions == instructions
+    assert record.to_dict()['instructions'] == instructions
+
+
+def test_round_trip_survives_vacuum():
+    pool = RecipePool()
+    records = [
+        pool.make({'id': i, 'name': f'Bread {i}', 'ingredients': ['flour'], 'instructions': lines})
+        for i, lines in enumerate(ODD_LINES)
+    ]
+    replaced = records.pop(0)
+    pool.release(replaced)
+    pool.vacuum(records)
+    assert [record.instructions for record in records] == ODD_LINES[1:]
+
+
+def test_details_and_ingredients_are_kept():
+    pool = RecipePool()
+    record = pool.make({'id': 7, 'name': 'Soup', 'ingredients': ['salt', 'water'], 'cook_time': 30})
+    other = pool.make({'id': 8, 'name': 'Stew', 'ingredients': ['salt'], 'instructions': ['Simmer']})
+    assert 'instructions' not in record
+    assert record['cook_time'] == 30
+    assert record.to_dict() == {'id': 7, 'name': 'Soup', 'ingredients': ['salt', 'water'], 'cook_time': 30}
+    assert record.ingredients[0] is other.ingredients[0]
@@ -0,0 +1,70 @@
+import itertools
+import random
+import string
+
+import pytest
+
+from recipe_related import RelatedIndex
+from recipe_storage import JournalStorage
+from recipe_store import RecipeStore
+
+WORDS = [''.join(letters) for letters in itertools.islice(itertools.product(string.ascii_lowercase, repeat=3), 400)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'), fsync=False)).load()
+    rng = random.Random(7)
+    recipes = []
+    for i in range(3000):
+        # Recipes draw from overlapping neighbourhoods of the vocabulary
+        base = rng.randrange(len(WORDS) - 20)
+        ingredients = [WORDS[base + rng.randrange(20)] for _ in range(rng.randint(2, 7))]
+        recipes.append({'name': f'Dish {i:04}', 'ingredients': ingredients, 'instructions': ['Cook']})
+    store.add_many(recipes)
+    yield store
+    store.close()
+
+
+def lists(index, recipe_ids):
+    return {recipe_id: index._entries(recipe_id) for recipe_id in recipe_ids}
+
+
+def test_numpy_build_matches_python_build(store):
+    pytest.importorskip('numpy')
+    recipe_ids = list(store.recipes)
+    random.Random(1).shuffle(recipe_ids)
+
+    built = []
+    for use_numpy in (False, True):
+        index = RelatedIndex(store.ingredient_index, use_numpy=use_numpy)
+        index.build(recipe_ids)
+        built.append(lists(index, recipe_ids))
+    assert built[0] == built[1]
+    assert sum(1 for entries in built[0].values() if entries) > len(recipe_ids) * 0.9
+
+
+def test_neighbours_share_ingredients(store):
+    twin = store.add('Twin', store.get(store.sorted_ids[0])['ingredients'], ['Cook'])
+    index = RelatedIndex(store.ingredient_index, use_numpy=False)
+    index.build(list(store.recipes))
+
+    assert store.sorted_ids[0] in index.related(twin.id)
+    tokens = store.ingredient_index._tokens_of(twin.id)
+    for other in index.related(twin.id):
+        assert tokens & store.ingredient_index._tokens_of(other)
+
+
+def test_edits_are_folded_in(store):
+    index = RelatedIndex(store.ingredient_index, use_numpy=False)
+    index.build(list(store.recipes))
+    first = store.sorted_ids[0]
+    twin = store.add('Twin', store.get(first)['ingredients'], ['Cook'])
+    index.add(twin.id)
+    assert first in index.related(twin.id)
+    assert index._entries(twin.id)[0][0] == 1.0
+    assert twin.id in index.related(first)
+
+    index.remove(twin.id)
+    assert index.related(twin.id) == []
+    assert twin.id not in index.related(first)
@@ -0,0 +1,102 @@
+import http.client
+import json
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from recipe_client import RemoteStore
+from recipe_server import run_in_thread
+from recipe_storage import JournalStorage
+from recipe_store import RecipeStore
+
+
+def serve(tmp_path, recipes=20):
+    store = RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+    store.add_many([
+        {'name': f'Dish {i:02}', 'ingredients': ['eggs', f'flour {i % 3}'], 'instructions': ['Mix', 'Bake']}
+        for i in range(recipes)
+    ])
+    return run_in_thread(store)
+
+
+def get(url, path):
+    url = urlsplit(url)
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def wait_for_related(url):
+    for _ in range(100):
+        status = get(url, '/status')[1]
+        if status['related'] != 'building':
+            return status
+        time.sleep(0.05)
+    raise AssertionError("the related-recipe build never finished")
+
+
+@pytest.fixture
+def server(tmp_path):
+    server, url = serve(tmp_path)
+    yield url
+    server.close()
+
+
+def test_remote_store_mirrors_the_catalogue(server):
+    client = RemoteStore(server).load()
+    assert [client.recipes[recipe_id]['name'] for recipe_id in client.sorted_ids][:3] == \
+        ['Dish 00', 'Dish 01', 'Dish 02']
+
+    other = RemoteStore(server).load()
+    added = client.add('Apple Pie', ['apples'], ['Bake'])
+    assert other.refresh()
+    assert other.sorted_ids == client.sorted_ids
+    assert other.get(added['id'])['ingredients'] == ['apples']
+    client.close()
+    other.close()
+
+
+@pytest.mark.parametrize('path', ['/recipes?limit=-5', '/search?q=dish&limit=-1', '/related/1?limit=-2'])
+def test_negative_limit_is_rejected(server, path):
+    status, payload = get(server, path)
+    assert status == 400
+    assert payload == {'error': "'limit' must not be negative"}
+
+
+def test_limits_page_the_results(server):
+    status, payload = get(server, '/recipes?limit=5')
+    assert status == 200
+    assert [name for _, name in payload['recipes']] == [f'Dish {i:02}' for i in range(5)]
+    assert get(server, '/recipes?limit=0')[1]['recipes'] == []
+    assert len(get(server, '/search?q=dish&limit=3')[1]['results']) == 3
+
+
+def test_related_build_reports_ready(server):
+    status = wait_for_related(server)
+    assert (status['related'], status['related_ready']) == ('ready', True)
+    assert 'related_error' not in status
+
+
+def test_failed_related_build_stops_client_waiting(tmp_path, monkeypatch):
+    def broken():
+        raise MemoryError("out of memory (test)")
+
+    store = RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+    monkeypatch.setattr(store, 'prepare_related_index', broken)
+    server, url = run_in_thread(store)
+    try:
+        status = wait_for_related(url)
+        assert (status['related'], status['related_ready']) == ('failed', False)
+        assert status['related_error'] == "MemoryError: out of memory (test)"
+
+        client = RemoteStore(url)
+        with pytest.raises(ValueError, match="out of memory"):
+            client.prepare_related_index().compute()
+        client.close()
+    finally:
+        server.close()
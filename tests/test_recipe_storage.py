@@ -0,0 +1,132 @@
+import pytest
+
+from recipe_storage import JournalStorage, SQLiteStorage, migrate_json_to_sqlite
+from recipe_store import RecipeStore
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def open_store(request, tmp_path):
+    def open_store():
+        if request.param == 'json':
+            return RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+        return RecipeStore(SQLiteStorage(str(tmp_path / 'recipes.db'))).load()
+    return open_store
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_deleted_ids_are_not_reused_after_reopen(open_store, background):
+    store = open_store()
+    store.add('Alpha', ['flour'], ['Mix'])
+    beta = store.add('Beta', ['eggs'], ['Beat'])
+    store.delete(beta.id)
+    store.save(background=background)
+    store.close()
+
+    store = open_store()
+    gamma = store.add('Gamma', ['milk'], ['Pour'])
+    store.close()
+    assert gamma.id == beta.id + 1
+
+    store = open_store()
+    assert store.add('Delta', ['salt'], ['Sprinkle']).id == gamma.id + 1
+    store.close()
+
+
+def test_binary_catalogue_keeps_next_id(tmp_path):
+    store = RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+    store.add('Alpha', ['flour'], ['Mix'])
+    beta = store.add('Beta', ['eggs'], ['Beat'])
+    store.delete(beta.id)
+    store.save()
+    store.storage.write_binary(store.recipes.values())
+    store.close()
+
+    store = RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+    assert store.catalogue is not None
+    assert store.add('Gamma', ['milk'], ['Pour']).id == beta.id + 1
+    store.close()
+
+
+def test_migration_keeps_next_id(tmp_path):
+    json_path, db_path = str(tmp_path / 'recipes.json'), str(tmp_path / 'recipes.db')
+    store = RecipeStore(JournalStorage(json_path)).load()
+    store.add('Alpha', ['flour'], ['Mix'])
+    beta = store.add('Beta', ['eggs'], ['Beat'])
+    store.delete(beta.id)
+    store.save()
+    store.close()
+
+    migrate_json_to_sqlite(json_path, db_path)
+    store = RecipeStore(SQLiteStorage(db_path)).load()
+    assert store.add('Gamma', ['milk'], ['Pour']).id == beta.id + 1
+    store.close()
+
+
+def reopen(tmp_path, **kwargs):
+    return RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'), **kwargs)).load()
+
+
+def catalogue_names(store):
+    return [store.recipes[recipe_id].name for recipe_id in store.sorted_ids]
+
+
+def test_torn_journal_tail_is_ignored(tmp_path):
+    store = reopen(tmp_path)
+    store.add('Alpha', ['flour'], ['Mix'])
+    store.add('Beta', ['eggs'], ['Beat'])
+    store.close()
+    with open(tmp_path / 'recipes.json.journal', 'ab') as f:
+        f.write(b'0badf00d {"op":"put","recipe":{"id":9')  # a write cut short by a crash
+
+    store = reopen(tmp_path)
+    assert catalogue_names(store) == ['Alpha', 'Beta']
+    store.close()
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path, background):
+    store = reopen(tmp_path, compact_every=5, fsync=False)
+    for i in range(12):
+        store.add(f'Dish {i:02}', ['rice'], ['Cook'])
+    store.delete(store.find('dish 03').id)
+    store.save(background=background)
+    # Edits made while a background compaction writes go into the fresh journal
+    store.update(store.find('dish 00').id, 'Dish 00 Deluxe', ['rice', 'saffron'], ['Cook slowly'])
+    store.storage.wait()
+    assert store.storage.journal_records < 5
+    assert not (tmp_path / 'recipes.json.journal.old').exists()
+    store.close()
+
+    store = reopen(tmp_path)
+    expected = ['Dish 00 Deluxe'] + [f'Dish {i:02}' for i in range(1, 12) if i != 3]
+    assert catalogue_names(store) == expected
+    assert store.get(store.find('dish 00 deluxe').id)['instructions'] == ['Cook slowly']
+    store.close()
+
+
+def test_binary_catalogue_overlay(tmp_path):
+    store = reopen(tmp_path)
+    for name, ingredient in [('Apple Pie', 'apples'), ('Banana Bread', 'bananas'), ('Cherry Tart', 'cherries')]:
+        store.add(name, [ingredient, 'flour'], ['Bake'])
+    store.save()
+    store.storage.write_binary(store.recipes.values())
+    store.close()
+
+    store = reopen(tmp_path)
+    assert store.catalogue is not None
+    banana, cherry = store.find('banana bread'), store.find('cherry tart')
+    store.delete(banana.id)
+    store.update(cherry.id, 'Sour Cherry Tart', ['sour cherries', 'flour'], ['Bake'])
+    store.add('Apricot Crumble', ['apricots', 'oats'], ['Bake'])
+    assert catalogue_names(store) == ['Apple Pie', 'Apricot Crumble', 'Sour Cherry Tart']
+    store.close()
+
+    # The journal's changes are replayed over the unchanged catalogue
+    store = reopen(tmp_path)
+    assert store.catalogue is not None
+    assert catalogue_names(store) == ['Apple Pie', 'Apricot Crumble', 'Sour Cherry Tart']
+    assert store.find('banana bread') is None
+    assert [store.recipes[i].name for i in store.search_names('tart')] == ['Sour Cherry Tart']
+    assert [store.recipes[i].name for i in store.search_ingredients('flour, NOT apples')] == ['Sour Cherry Tart']
+    assert store.get(store.find('apricot crumble').id)['ingredients'] == ['apricots', 'oats']
+    store.close()
@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from recipe_storage import JournalStorage
+from recipe_store import AVLTree, RecipeStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+    yield store
+    store.close()
+
+
+def test_add_many_accepts_a_generator(tmp_path, store):
+    added = store.add_many(
+        {'name': name, 'ingredients': ['water'], 'instructions': ['Boil']} for name in ('Soup', 'Broth')
+    )
+    assert [recipe.name for recipe in added] == ['Soup', 'Broth']
+    assert [store.recipes[recipe_id].name for recipe_id in store.sorted_ids] == ['Broth', 'Soup']
+    store.close()
+
+    reopened = RecipeStore(JournalStorage(str(tmp_path / 'recipes.json'))).load()
+    assert len(reopened) == 2
+    reopened.close()
+
+
+def test_update_many_accepts_a_generator(store):
+    soup = store.add('Soup', ['water'], ['Boil'])
+    store.update_many(
+        {**store.get(recipe_id), 'name': 'Clear Soup'} for recipe_id in [soup.id]
+    )
+    assert store.get(soup.id)['name'] == 'Clear Soup'
+    assert store.find('clear soup').id == soup.id
+
+
+def test_add_many_rejects_duplicates_before_storing(store):
+    store.add('Soup', ['water'], ['Boil'])
+    with pytest.raises(ValueError):
+        store.add_many(iter([{'name': 'Stew', 'ingredients': [], 'instructions': []},
+                             {'name': 'SOUP', 'ingredients': [], 'instructions': []}]))
+    assert len(store) == 1
+    assert store.find('stew') is None
+
+
+def height(node):
+    if node is None:
+        return 0
+    left, right = height(node.left), height(node.right)
+    assert abs(left - right) <= 1 and node.height == 1 + max(left, right)
+    return node.height
+
+
+def test_avl_tree_stays_balanced_and_ordered():
+    tree = AVLTree()
+    names = [f'Recipe {i:04}' for i in range(1000)]
+    for name in names:  # pre-sorted input, the worst case for an unbalanced tree
+        assert tree.insert({'name': name})
+    assert not tree.insert({'name': 'RECIPE 0001', 'new': True})
+    assert len(tree) == 1000 and tree.search('recipe 0001')['new']
+    assert height(tree.root) <= 14
+
+    random.Random(3).shuffle(names)
+    for name in names[:600]:
+        assert tree.delete(name)['name'].casefold() == name.casefold()
+    assert tree.delete(names[0]) is None
+    height(tree.root)
+    assert [recipe['name'].casefold() for recipe in tree] == sorted(name.casefold() for name in names[600:])
+
+    tree.update(names[600], {'name': 'Aardvark Stew'})
+    assert names[600] not in tree and next(iter(tree))['name'] == 'Aardvark Stew'
+    assert len(tree) == 400
+
+
+@pytest.fixture
+def kitchen(store):
+    for name, ingredients in [
+        ('Chicken Fried Rice', ['2 cups rice', '1 chicken breast', 'soy sauce']),
+        ('Chicken Noodles', ['200g noodles', '1 chicken breast', 'peanut butter']),
+        ('Tomato Soup', ['4 tomatoes', 'water', 'salt']),
+        ('Tomato Rice', ['1 cup rice', '2 tomatoes']),
+        ('Rice', ['1 cup rice', 'water']),
+    ]:
+        store.add(name, ingredients, ['Cook'])
+    return store
+
+
+def names(store, recipe_ids):
+    return [store.recipes[recipe_id].name for recipe_id in recipe_ids]
+
+
+def test_search_names_puts_the_exact_hit_first(kitchen):
+    assert names(kitchen, kitchen.search_names('rice')) == ['Rice', 'Chicken Fried Rice', 'Tomato Rice']
+    assert names(kitchen, kitchen.search_names('tom')) == ['Tomato Rice', 'Tomato Soup']
+    assert names(kitchen, kitchen.search_names('rice', limit=1)) == ['Rice']
+
+    kitchen.delete(kitchen.find('rice').id)
+    kitchen.add('Brown Rice', ['rice'], ['Boil'])
+    assert names(kitchen, kitchen.search_names('rice')) == ['Brown Rice', 'Chicken Fried Rice', 'Tomato Rice']
+
+
+def test_search_ingredients_boolean_query(kitchen):
+    assert names(kitchen, kitchen.search_ingredients('chicken, rice OR noodles, NOT peanut')) == ['Chicken Fried Rice']
+    assert names(kitchen, kitchen.search_ingredients('rice, -tomato')) == ['Chicken Fried Rice', 'Rice']
+
+    soup = kitchen.find('tomato soup')
+    kitchen.update(soup.id, 'Tomato Soup', ['4 tomatoes', 'rice'], ['Cook'])
+    assert names(kitchen, kitchen.search_ingredients('tomatoes, rice')) == ['Tomato Rice', 'Tomato Soup']
+
+
+def test_can_make_ranks_by_coverage(kitchen):
+    ranked = [(kitchen.recipes[recipe_id].name, matched, total)
+              for recipe_id, matched, total in kitchen.can_make('rice, water, tomatoes')]
+    # Equal coverage goes to the lower ID
+    assert ranked == [
+        ('Tomato Rice', 2, 2), ('Rice', 2, 2), ('Tomato Soup', 2, 3),
+        ('Chicken Fried Rice', 1, 5),
+    ]
+
+
+def test_search_fuzzy_tolerates_typos(kitchen):
+    assert set(names(kitchen, kitchen.search_fuzzy('tomatos', limit=2))) == {'Tomato Rice', 'Tomato Soup'}
+    assert names(kitchen, kitchen.search_fuzzy('chiken nodles', limit=1)) == ['Chicken Noodles']
+    assert kitchen.search_fuzzy('') == []